@@ -0,0 +1,266 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import content_store
+import metrics
+import mood
+import scenario_index
+import worker_pool
+
+# Headless JSON API for the mood detector and conflict-advice matching, for
+# clients that don't need the Streamlit page. It reuses the same analyzer,
+# keyword matcher, content store and scenario index as main.py.
+#
+#   python api.py --port 8600
+#   curl -s localhost:8600/v1/mood -d '{"text": "I am worried about my exam"}'
+#   curl -s localhost:8600/v1/advice/batch -d '{"texts": ["too much homework", "my friend ignores me"], "k": 2}'
+#
+# Endpoints (POST, JSON in and out):
+#   /v1/mood           {"text": ...}            -> {"emotion", "tips", "scores", "matches"}
+#   /v1/mood/batch     {"texts": [...]}         -> {"results": [...]}
+#   /v1/advice         {"text": ..., "k": 1}    -> {"matches": [{"scenario", "score", "tips"}]}
+#   /v1/advice/batch   {"texts": [...], "k": 1} -> {"results": [{"matches": [...]}]}
+# plus GET /health.
+#
+# Connections are kept alive (HTTP/1.1), each on a thread of its own, but only
+# requests take a processing slot: at most threads requests are handled at
+# once and up to backlog more wait for a slot, so idle keep-alive connections
+# can't starve anyone. Past that a request gets a 503, as does a connection
+# beyond max_connections. Mood batches run on a bounded worker_pool.WorkerPool,
+# as in the app; it answers 503 when full and 504 past the deadline.
+
+MAX_BODY_BYTES = int(os.getenv("SYNAPSE_API_MAX_BODY_BYTES", str(1024 * 1024)))
+MAX_BATCH = int(os.getenv("SYNAPSE_API_MAX_BATCH", "256"))
+# Texts per task sent to a pool worker.
+BATCH_CHUNK = int(os.getenv("SYNAPSE_API_BATCH_CHUNK", "32"))
+# Requests with fewer characters than this in total are scored inline.
+POOL_MIN_CHARS = int(os.getenv("SYNAPSE_POOL_MIN_CHARS", "2000"))
+SCENARIO_MATCH_FLOOR = float(os.getenv("SYNAPSE_SCENARIO_MATCH_FLOOR", "0.1"))
+SCENARIO_INDEX_CACHE_DIR = os.getenv("SYNAPSE_INDEX_CACHE_DIR", ".cache")
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class AnalysisService:
+    def __init__(self, pool=None, deadline=None):
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        self.analyzer = SentimentIntensityAnalyzer()
+        self.pool = pool
+        self.deadline = deadline
+        self.content = content_store.ContentStore()
+        self.indexes = scenario_index.ScenarioIndexCache(SCENARIO_INDEX_CACHE_DIR)
+        self.indexes.get(self.content.get().conflict_tips, self.content.get().conflicts_fingerprint)
+
+    def analyze(self, texts):
+        if self.pool is None or sum(len(text) for text in texts) < POOL_MIN_CHARS:
+            return [mood.analyze_mood(text, self.analyzer) for text in texts]
+        chunks = [texts[i:i + BATCH_CHUNK] for i in range(0, len(texts), BATCH_CHUNK)]
+        return [result for chunk in self.pool.imap(worker_pool.analyze_texts, chunks, deadline=self.deadline)
+                for result in chunk]
+
+    def advise(self, texts, k=1, min_score=SCENARIO_MATCH_FLOOR):
+        content = self.content.get()
+        index = self.indexes.get(content.conflict_tips, content.conflicts_fingerprint)
+        return [
+            [{"scenario": match.scenario, "score": round(match.score, 4), "tips": list(content.conflict_tips[match.scenario])}
+             for match in matches]
+            for matches in index.query_many(texts, k, min_score)
+        ]
+
+
+def _text(body):
+    text = body.get("text")
+    if not isinstance(text, str):
+        raise ApiError(400, '"text" must be a string')
+    return text
+
+
+def _texts(body):
+    texts = body.get("texts")
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        raise ApiError(400, '"texts" must be a list of strings')
+    if len(texts) > MAX_BATCH:
+        raise ApiError(413, f"at most {MAX_BATCH} texts per request")
+    return texts
+
+
+def _k(body):
+    k = body.get("k", 1)
+    if not isinstance(k, int) or isinstance(k, bool) or not 1 <= k <= 10:
+        raise ApiError(400, '"k" must be an integer from 1 to 10')
+    return k
+
+
+def mood_one(service, body):
+    return service.analyze([_text(body)])[0]
+
+
+def mood_batch(service, body):
+    return {"results": service.analyze(_texts(body))}
+
+
+def advice_one(service, body):
+    return {"matches": service.advise([_text(body)], _k(body))[0]}
+
+
+def advice_batch(service, body):
+    return {"results": [{"matches": matches} for matches in service.advise(_texts(body), _k(body))]}
+
+
+ROUTES = {
+    "/v1/mood": mood_one,
+    "/v1/mood/batch": mood_batch,
+    "/v1/advice": advice_one,
+    "/v1/advice/batch": advice_batch,
+}
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "SynapseAPI/1"
+    # An idle keep-alive connection gives its thread back after this long.
+    timeout = float(os.getenv("SYNAPSE_API_IDLE_TIMEOUT", "15"))
+
+    def _send(self, status, payload, headers=()):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok"})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        route = ROUTES.get(self.path)
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            # Without a usable length the body can't be skipped either.
+            self.close_connection = True
+            self._send(400, {"error": "Content-Length must be a non-negative integer"})
+            return
+        if length > MAX_BODY_BYTES:
+            # The body is left unread, so this connection can't be reused.
+            self.close_connection = True
+            self._send(413, {"error": f"body larger than {MAX_BODY_BYTES} bytes"})
+            return
+        raw = self.rfile.read(length)
+        if route is None:
+            self._send(404, {"error": "not found"})
+            return
+        try:
+            body = json.loads(raw or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError
+        except ValueError:
+            self._send(400, {"error": "body must be a JSON object"})
+            return
+        if not self.server.admitted.acquire(blocking=False):
+            metrics.record_error("api", "rejected")
+            self._send(503, {"error": "busy, try again shortly"}, [("Retry-After", "1")])
+            return
+        try:
+            with self.server.slots, metrics.timed(f"api:{self.path}"):
+                payload = route(self.server.service, body)
+        except ApiError as e:
+            self._send(e.status, {"error": str(e)})
+        except worker_pool.PoolBusy:
+            self._send(503, {"error": "busy, try again shortly"}, [("Retry-After", "1")])
+        except worker_pool.DeadlineExceeded:
+            self._send(504, {"error": "analysis took too long"})
+        except Exception as e:
+            # e.g. BrokenProcessPool or a bug in an analyzer: still answer.
+            metrics.record_error("api", type(e).__name__)
+            traceback.print_exc()
+            self._send(500, {"error": "internal error"})
+        else:
+            self._send(200, payload)
+        finally:
+            self.server.admitted.release()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class BoundedHTTPServer(ThreadingHTTPServer):
+    # A thread per connection, so a keep-alive connection waiting for its next
+    # request holds only its own thread (until ApiHandler.timeout). The work
+    # is bounded per request instead: slots for the ones being handled,
+    # admitted for those plus the ones waiting. Connections beyond
+    # max_connections are turned away from the accept loop.
+    def __init__(self, address, service, threads=16, backlog=64, max_connections=256):
+        super().__init__(address, ApiHandler)
+        self.service = service
+        self.slots = threading.BoundedSemaphore(threads)
+        self.admitted = threading.BoundedSemaphore(threads + backlog)
+        self.connections = threading.BoundedSemaphore(max_connections)
+
+    def process_request(self, request, client_address):
+        if not self.connections.acquire(blocking=False):
+            metrics.record_error("api", "rejected_connection")
+            request.sendall(b"HTTP/1.1 503 Service Unavailable\r\nRetry-After: 1\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            self.shutdown_request(request)
+            return
+        super().process_request(request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self.connections.release()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve mood analysis and advice matching as JSON over HTTP.")
+    parser.add_argument("--host", default=os.getenv("SYNAPSE_API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SYNAPSE_API_PORT", "8600")))
+    parser.add_argument("--threads", type=int, default=int(os.getenv("SYNAPSE_API_THREADS", "16")),
+                        help="requests handled at once")
+    parser.add_argument("--backlog", type=int, default=int(os.getenv("SYNAPSE_API_BACKLOG", "64")),
+                        help="requests allowed to wait for a slot")
+    parser.add_argument("--max-connections", type=int, default=int(os.getenv("SYNAPSE_API_MAX_CONNECTIONS", "256")),
+                        help="open connections, idle keep-alive ones included")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SYNAPSE_POOL_WORKERS", str(min(4, os.cpu_count() or 1)))),
+                        help="analysis processes; 0 scores in the request threads")
+    parser.add_argument("--max-pending", type=int, default=None)
+    parser.add_argument("--deadline-ms", type=float, default=float(os.getenv("SYNAPSE_POOL_DEADLINE_MS", "5000")))
+    args = parser.parse_args(argv)
+
+    metrics.start_exporters()
+    pool = None
+    if args.workers > 0:
+        pool = worker_pool.WorkerPool(args.workers, args.max_pending)
+        pool.warm_up()
+    server = BoundedHTTPServer((args.host, args.port), AnalysisService(pool, args.deadline_ms / 1000),
+                               args.threads, args.backlog, args.max_connections)
+    print(f"Serving on http://{args.host}:{server.server_port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if pool is not None:
+            pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import functools
+import html
+import json
+import os
+
+# Runtime side of build_assets.py: looks up the pre-sized images and the
+# self-hosted font in static/manifest.json. Everything here is read once per
+# process; when the build step hasn't run, callers fall back to the original
+# files.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_PATH = os.path.join(ROOT, "static", "manifest.json")
+STATIC_URL = "app/static"
+
+
+@functools.lru_cache(maxsize=1)
+def manifest():
+    try:
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def font_face():
+    return manifest().get("font_face")
+
+
+# Images load eagerly: the banner is the first thing on the page and
+# deferring it only delays the largest paint. Pass lazy=True for images that
+# sit below the fold.
+@functools.lru_cache(maxsize=None)
+def image_html(name, caption=None, lazy=False):
+    entry = manifest().get("images", {}).get(name)
+    if entry is None:
+        return None
+    alt = html.escape(caption or "", quote=True)
+    loading = ' loading="lazy"' if lazy else ""
+    tag = (
+        f'<picture><source type="image/webp" srcset="{STATIC_URL}/{entry["webp_1x"]} 1x, {STATIC_URL}/{entry["webp_2x"]} 2x">'
+        f'<img src="{STATIC_URL}/{entry["png"]}" width="{entry["width"]}" height="{entry["height"]}" alt="{alt}"{loading}>'
+        f"</picture>"
+    )
+    if caption:
+        tag += f'<div style="font-size: 14px; opacity: 0.6;">{html.escape(caption)}</div>'
+    return f"<div>{tag}</div>"
+
+
+@functools.lru_cache(maxsize=None)
+def _read_text(path, mtime_ns):
+    with open(path) as f:
+        return f.read()
+
+
+def read_text(path):
+    # Cached per (path, mtime), so an edited file is picked up on the next
+    # rerun without re-reading it on every one.
+    return _read_text(path, os.stat(path).st_mtime_ns)
@@ -0,0 +1,178 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+from collections import deque, namedtuple
+
+import worker_pool
+
+# Offline re-scoring of journal exports, e.g.
+#
+#   python batch.py entries.jsonl scored.jsonl --workers 8 --chunk-size 2000
+#
+# Input and output are streamed: only about workers chunks are ever held in
+# memory, and results are written in input order as soon as each chunk is done.
+# Scoring runs on a worker_pool.WorkerPool, the same workers and analyzer as
+# the app and the API. A line that isn't a JSON object, or a record whose
+# text field is missing, null or not a string, is skipped and counted rather than stopping the run;
+# --errors writes them to a JSONL file for a second pass.
+
+# line is the input line number where known.
+BadRecord = namedtuple("BadRecord", ["line", "error", "record"])
+
+
+def score_record(record, result):
+    # record with the fields of its mood.analyze_mood result added.
+    scored = dict(record)
+    scored["emotion"] = result["emotion"]
+    scored["tips_key"] = result["emotion"]
+    scored["pos"] = result["scores"]["pos"]
+    scored["neg"] = result["scores"]["neg"]
+    scored["compound"] = result["scores"]["compound"]
+    return scored
+
+
+def detect_format(path, fmt):
+    if fmt:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def open_stream(path, mode):
+    if path == "-":
+        return sys.stdin if "r" in mode else sys.stdout
+    return open(path, mode, newline="", encoding="utf-8")
+
+
+def read_records(stream, fmt):
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield BadRecord(line_number, f"invalid JSON: {e}", line)
+            continue
+        if not isinstance(record, dict):
+            yield BadRecord(line_number, "not a JSON object", line)
+            continue
+        yield record
+
+
+class RecordWriter:
+    # CSV columns are fixed by the first record, since the header has to be
+    # written before anything else is seen. Fields a later record adds go into
+    # a trailing "extra" column as a JSON object instead of being dropped.
+    EXTRA_COLUMN = "extra"
+
+    def __init__(self, stream, fmt):
+        self.stream = stream
+        self.fmt = fmt
+        self.csv_writer = None
+        self.fieldnames = None
+
+    def write(self, record):
+        if self.fmt == "jsonl":
+            self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+            return
+        if self.csv_writer is None:
+            self.fieldnames = [name for name in record.keys() if name != self.EXTRA_COLUMN]
+            self.csv_writer = csv.DictWriter(self.stream, fieldnames=[*self.fieldnames, self.EXTRA_COLUMN], restval="")
+            self.csv_writer.writeheader()
+        row = {name: record[name] for name in self.fieldnames if name in record}
+        extra = {name: value for name, value in record.items() if name not in row}
+        if extra:
+            row[self.EXTRA_COLUMN] = json.dumps(extra, ensure_ascii=False)
+        self.csv_writer.writerow(row)
+
+
+def chunked(records, chunk_size):
+    iterator = iter(records)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def score_stream(records, text_field="text", workers=None, chunk_size=1000, on_error=None):
+    # Yields scored records in input order. Bad records go to on_error (or
+    # are dropped) instead of being yielded.
+    def report(bad):
+        if on_error is not None:
+            on_error(bad)
+
+    def valid(records):
+        for record in records:
+            if isinstance(record, BadRecord):
+                report(record)
+            elif not isinstance(record.get(text_field), str):
+                # Missing or null too: a mistyped --text-field would
+                # otherwise label every record from an empty string.
+                report(BadRecord(None, f"{text_field!r} is missing or not text", record))
+            else:
+                yield record
+
+    # The pool is sent only the texts; each chunk's records wait here, in
+    # order, until its results come back.
+    in_flight = deque()
+
+    def texts(chunks):
+        for chunk in chunks:
+            in_flight.append(chunk)
+            yield [record[text_field] for record in chunk]
+
+    pool = worker_pool.WorkerPool(workers or os.cpu_count() or 1)
+    try:
+        for results in pool.imap(worker_pool.analyze_texts, texts(chunked(valid(records), chunk_size))):
+            for record, result in zip(in_flight.popleft(), results):
+                yield score_record(record, result)
+    finally:
+        pool.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score journal entries with the Mood Detector.")
+    parser.add_argument("input", help="JSONL or CSV file of entries, or - for stdin")
+    parser.add_argument("output", help="where to write scored entries, or - for stdout")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--input-format", choices=["jsonl", "csv"])
+    parser.add_argument("--output-format", choices=["jsonl", "csv"])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--errors", help="write skipped records here as JSONL")
+    args = parser.parse_args(argv)
+
+    input_format = detect_format(args.input, args.input_format)
+    output_format = detect_format(args.output, args.output_format)
+    count = 0
+    skipped = 0
+    error_sink = open(args.errors, "w", encoding="utf-8") if args.errors else None
+
+    def on_error(bad):
+        nonlocal skipped
+        skipped += 1
+        if error_sink is not None:
+            error_sink.write(json.dumps(bad._asdict(), ensure_ascii=False, default=str) + "\n")
+
+    try:
+        with open_stream(args.input, "r") as source, open_stream(args.output, "w") as sink:
+            writer = RecordWriter(sink, output_format)
+            records = read_records(source, input_format)
+            for scored in score_stream(records, args.text_field, args.workers, args.chunk_size, on_error):
+                writer.write(scored)
+                count += 1
+    finally:
+        if error_sink is not None:
+            error_sink.close()
+    print(f"Scored {count} entries, skipped {skipped}.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+# Shared helpers for the benchmark and load-test scripts. Everything runs from
+# the repository root, e.g. python bench/run_benchmarks.py.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN_SCRIPT = os.path.join(ROOT, "main.py")
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+WORDS = (
+    "today I felt happy about my project but also worried about the exam tomorrow "
+    "my friend was annoyed with me and I am thinking about how to fix it "
+    "the weather was calm and I went for a walk to clear my head"
+).split()
+
+
+def sample_text(word_count):
+    return " ".join(WORDS[i % len(WORDS)] for i in range(word_count))
+
+
+def summarize(samples_ms):
+    ordered = sorted(samples_ms)
+    def percentile(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": round(percentile(0.50), 3),
+        "p95_ms": round(percentile(0.95), 3),
+        "p99_ms": round(percentile(0.99), 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def time_ms(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return (time.perf_counter() - started) * 1000, result
+
+
+@contextmanager
+def scratch_state():
+    # Points the app's history database, data directory and index cache at a
+    # temporary directory for the duration, so simulated sessions never write
+    # into the real data/ or replace the .cache/ index. Set before any session
+    # starts; spawned processes inherit it.
+    directory = tempfile.mkdtemp(prefix="synapse-bench-")
+    names = ("SYNAPSE_DATA_DIR", "SYNAPSE_HISTORY_DB", "SYNAPSE_INDEX_CACHE_DIR")
+    saved = {name: os.environ.get(name) for name in names}
+    os.environ["SYNAPSE_DATA_DIR"] = directory
+    os.environ["SYNAPSE_HISTORY_DB"] = os.path.join(directory, "history.sqlite3")
+    os.environ["SYNAPSE_INDEX_CACHE_DIR"] = os.path.join(directory, "cache")
+    try:
+        yield directory
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def new_app(timeout=60):
+    # AppTest isn't thread-safe: drive each one from a single thread, and run
+    # concurrent sessions in separate processes (see load_test.py).
+    from streamlit.testing.v1 import AppTest
+    return AppTest.from_file(MAIN_SCRIPT, default_timeout=timeout)
+
+
+def find_button(app, label):
+    return next(button for button in app.button if button.label == label)
+
+
+def write_results(results, output):
+    text = json.dumps(results, indent=2)
+    if output in (None, "-"):
+        print(text)
+        return
+    with open(output, "w") as f:
+        f.write(text + "\n")
+
+
+def compare(results, baseline, tolerance, prefix=""):
+    # Lists every *_ms value that got slower than baseline by more than
+    # tolerance (a fraction); used to fail CI on regressions.
+    regressions = []
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        base = baseline.get(key) if isinstance(baseline, dict) else None
+        if isinstance(value, dict):
+            regressions += compare(value, base or {}, tolerance, f"{path}.")
+        elif key.endswith("_ms") and isinstance(base, (int, float)) and base > 0 and value > base * (1 + tolerance):
+            regressions.append(f"{path}: {base} -> {value}")
+    return regressions
@@ -0,0 +1,135 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import common
+import stub_llm_server
+
+# Simulates N concurrent users clicking through the app: a kindness challenge,
+# mood analysis and free-text conflict advice, with the LLM calls going to the
+# local stub server. Reports latency percentiles per action plus throughput
+# and errors as JSON.
+#
+#   python bench/load_test.py --users 20 --iterations 5 --output load.json
+#
+# AppTest isn't thread-safe, so each user is an AppTest session in its own
+# process. That makes every user a separate app instance: cache_resource
+# objects (the analysis pool, the scenario index) are per user rather than
+# shared as on a real server, so --pool-workers defaults to 1 to keep the
+# process count down. History and caches go to a scratch directory (see
+# common.scratch_state), never the app's own data/.
+
+ENTRIES = [
+    "I am so happy that my project went well today",
+    "I'm worried about tomorrow's exam and I can't sleep",
+    "my group never answers my messages and I'm annoyed",
+    common.sample_text(400),
+]
+CONFLICTS = [
+    "I have too much homework and no idea where to begin",
+    "I keep putting off revision for my history test",
+    "my presentation is next week and I'm nervous about speaking",
+]
+
+
+def run_user(user, iterations):
+    # Runs in a process of its own; see simulate_user.
+    try:
+        return simulate_user(user, iterations)
+    finally:
+        # The app's analysis pool lives as long as the app and is never shut
+        # down; its processes would keep this one from exiting.
+        for child in multiprocessing.active_children():
+            child.terminate()
+
+
+def simulate_user(user, iterations):
+    # (timings, errors, started, finished), the last two being the
+    # wall-clock span of the session.
+    rng = random.Random(user)
+    timings = {}
+    errors = []
+
+    def record(action, func):
+        try:
+            elapsed_ms, _ = common.time_ms(func)
+        except Exception as e:
+            errors.append({"user": user, "action": action, "error": repr(e)})
+            return False
+        timings.setdefault(action, []).append(elapsed_ms)
+        return True
+
+    app = common.new_app()
+    started = time.time()
+    if not record("initial_load", app.run):
+        return timings, errors, started, time.time()
+    for _ in range(iterations):
+        record("challenge", lambda: common.find_button(app, "Get My Challenge! 🎁").click().run())
+        if app.checkbox:
+            record("complete_challenge", lambda: app.checkbox[0].check().run())
+        app.text_area[0].input(rng.choice(ENTRIES))
+        record("mood", lambda: common.find_button(app, "Analyze My Mood 🔍").click().run())
+        record("select_other", lambda: app.selectbox(key="selectbox2").select("Other").run())
+        app.text_area[-1].input(rng.choice(CONFLICTS))
+        record("advice", lambda: common.find_button(app, "Get Advice").click().run())
+        for element in app.exception:
+            errors.append({"user": user, "action": "script", "error": element.message})
+    return timings, errors, started, time.time()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the app with concurrent headless sessions.")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--pool-workers", type=int, default=1, help="analysis processes per simulated user")
+    parser.add_argument("--output", default="-")
+    args = parser.parse_args(argv)
+
+    os.chdir(common.ROOT)
+    with common.scratch_state():
+        server, url = stub_llm_server.start(latency=args.llm_latency, error_rate=args.llm_error_rate)
+        os.environ["SYNAPSE_LLM_URL"] = url
+        os.environ["SYNAPSE_POOL_WORKERS"] = str(args.pool_workers)
+
+        timings = {}
+        errors = []
+        spans = []
+        with ProcessPoolExecutor(max_workers=args.users, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(run_user, user, args.iterations) for user in range(args.users)]
+            for user, future in enumerate(futures):
+                try:
+                    user_timings, user_errors, started, finished = future.result()
+                except Exception as e:
+                    errors.append({"user": user, "action": "process", "error": repr(e)})
+                    continue
+                for action, samples in user_timings.items():
+                    timings.setdefault(action, []).extend(samples)
+                errors += user_errors
+                spans.append((started, finished))
+        server.shutdown()
+    # From the first session starting to the last one finishing, leaving out
+    # process start-up.
+    wall_s = max(finished for _, finished in spans) - min(started for started, _ in spans) if spans else 0.0
+
+    interactions = sum(len(samples) for samples in timings.values())
+    common.write_results({
+        "users": args.users,
+        "iterations": args.iterations,
+        "wall_s": round(wall_s, 3),
+        "interactions_per_s": round(interactions / wall_s, 2) if wall_s else 0.0,
+        "actions": {action: common.summarize(samples) for action, samples in sorted(timings.items())},
+        "error_count": len(errors),
+        "errors": errors[:50],
+    }, args.output)
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
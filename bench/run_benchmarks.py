@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import common
+import stub_llm_server
+
+# Reproducible benchmarks for the app, driven headlessly through Streamlit's
+# AppTest. Prints (or writes) one JSON document; pass --baseline to fail when
+# any *_ms figure regressed by more than --tolerance.
+#
+#   python bench/run_benchmarks.py --output bench-results.json
+#   python bench/run_benchmarks.py --baseline bench-results.json
+
+MOOD_WORD_COUNTS = (10, 100, 1000, 5000)
+SCENARIO_COUNTS = (10, 100, 1000, 5000)
+
+COLD_START_SNIPPET = """
+import time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({script!r}, default_timeout=120)
+app.run()
+print((time.perf_counter() - started) * 1000)
+"""
+
+
+def bench_cold_start(repeats):
+    samples = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", COLD_START_SNIPPET.format(script=common.MAIN_SCRIPT)],
+            cwd=common.ROOT, check=True, capture_output=True, text=True,
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return common.summarize(samples)
+
+
+def bench_warm_rerun(repeats):
+    app = common.new_app()
+    app.run()
+    return common.summarize([common.time_ms(app.run)[0] for _ in range(repeats)])
+
+
+def bench_mood(repeats):
+    import mood
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+    analyzer = SentimentIntensityAnalyzer()
+    results = {}
+    for word_count in MOOD_WORD_COUNTS:
+        text = common.sample_text(word_count)
+        results[f"{word_count}_words"] = {
+            "analyze_mood": common.summarize([common.time_ms(mood.analyze_mood, text, analyzer)[0] for _ in range(repeats)]),
+            "keyword_scan": common.summarize([common.time_ms(mood.match_emotions, text)[0] for _ in range(repeats)]),
+            "by_sentence": common.summarize(
+                [common.time_ms(mood.analyze_sentences, mood.split_sentences(text), analyzer)[0] for _ in range(repeats)]
+            ),
+        }
+    # The same path end to end through the UI, for the largest entry.
+    app = common.new_app()
+    app.run()
+    app.text_area[0].input(common.sample_text(MOOD_WORD_COUNTS[-1]))
+    samples = []
+    for _ in range(max(1, repeats // 10)):
+        samples.append(common.time_ms(common.find_button(app, "Analyze My Mood 🔍").click().run)[0])
+    results[f"ui_{MOOD_WORD_COUNTS[-1]}_words"] = common.summarize(samples)
+    return results
+
+
+def synthetic_tips(scenario_count):
+    import content_store
+
+    base = content_store.load_content().conflict_tips
+    tips = {}
+    for i in range(scenario_count):
+        title, scenario_tips = list(base.items())[i % len(base)]
+        tips[f"{title} (variant {i})"] = tuple(f"{tip} [{i}]" for tip in scenario_tips)
+    return tips
+
+
+def bench_scenario_matching(repeats):
+    import scenario_index
+
+    queries = ["I have too much homework and I'm stressed", "my friend is ignoring me", "scared of my maths exam"]
+    results = {}
+    for scenario_count in SCENARIO_COUNTS:
+        tips = synthetic_tips(scenario_count)
+        build_ms, index = common.time_ms(scenario_index.ScenarioIndex, tips)
+        samples = [common.time_ms(index.query, queries[i % len(queries)], 3, 0.1)[0] for i in range(repeats)]
+        results[f"{scenario_count}_scenarios"] = {"build_ms": round(build_ms, 3), "query": common.summarize(samples)}
+    return results
+
+
+def bench_session_memory(sessions):
+    # Python heap retained per extra AppTest session after one full run each.
+    common.new_app().run()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    apps = []
+    for _ in range(sessions):
+        app = common.new_app()
+        app.run()
+        apps.append(app)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return {"sessions": sessions, "bytes_per_session": retained // sessions}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the app headlessly.")
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--cold-starts", type=int, default=3)
+    parser.add_argument("--sessions", type=int, default=10, help="sessions to average memory over")
+    parser.add_argument("--output", default="-")
+    parser.add_argument("--baseline", help="earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    os.chdir(common.ROOT)
+    with common.scratch_state():
+        server, url = stub_llm_server.start()
+        os.environ["SYNAPSE_LLM_URL"] = url
+
+        results = {
+            "timestamp": time.time(),
+            "python": sys.version.split()[0],
+            "cold_start": bench_cold_start(args.cold_starts),
+            "warm_rerun": bench_warm_rerun(args.repeats),
+            "mood_detector": bench_mood(args.repeats),
+            "scenario_matching": bench_scenario_matching(args.repeats),
+            "session_memory": bench_session_memory(args.sessions),
+        }
+        server.shutdown()
+    common.write_results(results, args.output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = common.compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the Hugging Face text-generation endpoint, so the advice
+# path can be benchmarked and load-tested without the network. Point the app
+# at it with SYNAPSE_LLM_URL=http://127.0.0.1:<port>/.
+#
+# Answers {"inputs": ...} with [{"generated_text": ...}], or with server-sent
+# token events when the payload has "stream": true. Latency, per-token delay
+# and the share of 503 responses are configurable. For tests, a script of
+# status codes can be served first (with an optional Retry-After on each),
+# events replaces the streamed token events with raw data: payloads, and
+# server.request_count counts every POST.
+
+REPLY = "- Take a slow breath and write down what is worrying you.\n- Break the work into small steps.\n- Ask a teacher or friend for help."
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.05
+    token_delay = 0.005
+    error_rate = 0.0
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with self.server.lock:
+            self.server.request_count += 1
+            status = self.server.script.pop(0) if self.server.script else 200
+        time.sleep(self.latency)
+        if status != 200:
+            headers = [("Retry-After", self.server.retry_after)] if self.server.retry_after is not None else []
+            self._send(status, "application/json", b'{"error": "scripted"}', headers)
+            return
+        if random.random() < self.error_rate:
+            self._send(503, "application/json", b'{"error": "overloaded"}')
+            return
+        if not payload.get("stream"):
+            self._send(200, "application/json", json.dumps([{"generated_text": REPLY}]).encode("utf-8"))
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        events = self.server.events
+        if events is None:
+            events = [json.dumps({"token": {"text": token + " ", "special": False}}) for token in REPLY.split(" ")]
+        for event in events:
+            time.sleep(self.token_delay)
+            self._chunk(f"data: {event}\n\n".encode("utf-8"))
+        self._chunk(b"data: [DONE]\n\n")
+        self._chunk(b"")
+
+    def _chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send(self, status, content_type, body, headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(port=0, latency=0.05, token_delay=0.005, error_rate=0.0, script=(), retry_after=None, events=None):
+    # Starts the stub on a background thread and returns (server, url).
+    handler = type("ConfiguredStubHandler", (StubHandler,), {
+        "latency": latency, "token_delay": token_delay, "error_rate": error_rate,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.request_count = 0
+    server.script = list(script)
+    server.retry_after = retry_after
+    server.events = events
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a stand-in for the LLM endpoint.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before the first byte")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="seconds between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    args = parser.parse_args(argv)
+    server, url = start(args.port, args.latency, args.token_delay, args.error_rate)
+    print(f"Stub LLM server listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import urllib.request
+
+# Fetches and prepares the static assets the app serves itself instead of
+# pulling from third-party CDNs or re-encoding on every rerun. Run once per
+# build/deploy:
+#
+#   python build_assets.py
+#
+# Output under static/ is served by Streamlit's static file serving (see
+# .streamlit/config.toml) at app/static/. File names carry a content hash, so
+# a proxy in front of the app can mark them immutable with a long max-age.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(ROOT, "static")
+MANIFEST_PATH = os.path.join(STATIC_DIR, "manifest.json")
+
+KONVA_VERSION = "8.4.3"
+KONVA_URL = f"https://unpkg.com/konva@{KONVA_VERSION}/konva.min.js"
+KONVA_PATH = os.path.join(ROOT, "mandala_frontend", "vendor", "konva.min.js")
+
+# Widths the images are displayed at in main.py. Each gets a 1x and 2x WebP
+# plus a 1x PNG fallback.
+IMAGE_WIDTHS = {
+    "banner.png": 541,
+    "kindness.png": 100,
+    "girl.png": 200,
+    "boy.png": 200,
+    "positive.png": 200,
+}
+
+FONT_FAMILY = "Comic Relief"
+FONT_URL = "https://github.com/google/fonts/raw/main/ofl/comicrelief/ComicRelief-Regular.ttf"
+FONT_SOURCE_PATH = os.path.join(ROOT, ".cache", "fonts", "ComicRelief-Regular.ttf")
+# Basic Latin, Latin-1 and the typographic quotes and dashes the copy uses.
+FONT_UNICODES = "U+0020-007E,U+00A0-00FF,U+2013-2014,U+2018-201D,U+2026"
+
+
+def download(url, path, force=False):
+    if os.path.exists(path) and not force:
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f"{path}.tmp"
+    with urllib.request.urlopen(url, timeout=30) as response, open(temporary_path, "wb") as f:
+        f.write(response.read())
+    os.replace(temporary_path, path)
+    return True
+
+
+def write_hashed(data, directory, stem, extension):
+    digest = hashlib.sha1(data).hexdigest()[:12]
+    relative_path = f"{directory}/{stem}-{digest}.{extension}"
+    path = os.path.join(STATIC_DIR, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return relative_path
+
+
+def vendor_konva(force=False):
+    if download(KONVA_URL, KONVA_PATH, force):
+        print(f"Bundled Konva {KONVA_VERSION} into {os.path.relpath(KONVA_PATH, ROOT)}")
+
+
+def build_images():
+    import io
+
+    from PIL import Image
+
+    images = {}
+    for name, width in IMAGE_WIDTHS.items():
+        stem = os.path.splitext(name)[0]
+        with Image.open(os.path.join(ROOT, name)) as source:
+            source = source.convert("RGBA")
+            entry = {"width": width}
+            for scale in (1, 2):
+                target_width = min(width * scale, source.width)
+                target_height = round(source.height * target_width / source.width)
+                resized = source.resize((target_width, target_height), Image.LANCZOS)
+                output = io.BytesIO()
+                resized.save(output, format="WEBP", quality=82, method=6)
+                entry[f"webp_{scale}x"] = write_hashed(output.getvalue(), "images", f"{stem}-{scale}x", "webp")
+                if scale == 1:
+                    output = io.BytesIO()
+                    resized.save(output, format="PNG", optimize=True)
+                    entry["png"] = write_hashed(output.getvalue(), "images", stem, "png")
+                    entry["height"] = target_height
+        images[name] = entry
+        print(f"Resized {name} for display at {width}px")
+    return images
+
+
+def build_font(force=False):
+    # Subsetting needs fontTools (and brotli for WOFF2); without them the full
+    # TTF is served, which is still better than a render-blocking request to
+    # fonts.googleapis.com.
+    download(FONT_URL, FONT_SOURCE_PATH, force)
+    try:
+        from fontTools import subset
+    except ImportError:
+        with open(FONT_SOURCE_PATH, "rb") as f:
+            return write_hashed(f.read(), "fonts", "comic-relief", "ttf"), "truetype"
+    options = subset.Options()
+    options.flavor = "woff2"
+    font = subset.load_font(FONT_SOURCE_PATH, options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=subset.parse_unicodes(FONT_UNICODES))
+    subsetter.subset(font)
+    temporary_path = os.path.join(STATIC_DIR, "fonts", "comic-relief.woff2.tmp")
+    os.makedirs(os.path.dirname(temporary_path), exist_ok=True)
+    subset.save_font(font, temporary_path, options)
+    with open(temporary_path, "rb") as f:
+        data = f.read()
+    os.remove(temporary_path)
+    return write_hashed(data, "fonts", "comic-relief", "woff2"), "woff2"
+
+
+def build_static(force=False):
+    if os.path.isdir(STATIC_DIR):
+        shutil.rmtree(STATIC_DIR)
+    images = build_images()
+    font_path, font_format = build_font(force)
+    font_face = (
+        f"@font-face {{ font-family: '{FONT_FAMILY}'; font-style: normal; font-weight: 400; font-display: swap; "
+        f"src: url('app/static/{font_path}') format('{font_format}'); unicode-range: {FONT_UNICODES}; }}"
+    )
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump({"images": images, "font_face": font_face}, f, indent=2)
+    print(f"Wrote {os.path.relpath(MANIFEST_PATH, ROOT)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the app's self-hosted static assets.")
+    parser.add_argument("--force", action="store_true", help="re-download sources that are already cached")
+    args = parser.parse_args(argv)
+    vendor_konva(args.force)
+    build_static(args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+# Challenges, conflict scenarios and the static section lists live in JSON
+# files under content/ (or SYNAPSE_CONTENT_DIR) so they can be edited without a
+# redeploy. Each load is validated and frozen into one immutable Content
+# snapshot shared by every session.
+CONTENT_DIR = os.getenv("SYNAPSE_CONTENT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "content"))
+CONTENT_FILES = ("challenges.json", "conflicts.json", "mindfulness.json", "journaling.json", "affirmations.json")
+
+Content = namedtuple("Content", [
+    "challenges",             # challenge text -> emoji
+    "challenge_ids",          # challenge text -> stable integer id
+    "challenge_texts",        # stable integer id -> challenge text
+    "conflict_scenarios",     # scenario titles in display order
+    "conflict_tips",          # scenario title -> tuple of tips
+    "conflicts_fingerprint",  # changes whenever any title or tip changes
+    "mindfulness_exercises",  # tuple of (title, text)
+    "journaling_prompts",
+    "affirmations",
+])
+
+
+class ContentError(ValueError):
+    pass
+
+
+def fingerprint(data):
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _read(directory, name):
+    with open(os.path.join(directory, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _section(directory, name, key, problems):
+    data = _read(directory, name)
+    if not isinstance(data, dict):
+        problems.append(f"{name}: expected an object at the top level, got {type(data).__name__}")
+        return None
+    return data.get(key)
+
+
+def _entries(values, where, problems):
+    # (index, entry) for every entry that is an object; anything else,
+    # including a section that isn't a list, is reported instead.
+    if not isinstance(values, list):
+        problems.append(f"{where}: expected a list, got {type(values).__name__}")
+        return
+    for i, entry in enumerate(values):
+        if isinstance(entry, dict):
+            yield i, entry
+        else:
+            problems.append(f"{where}[{i}]: expected an object, got {type(entry).__name__}")
+
+
+def _text(value, where, problems):
+    if not isinstance(value, str) or not value.strip():
+        problems.append(f"{where}: expected non-empty text, got {value!r}")
+        return ""
+    return value.strip()
+
+
+def _text_list(values, where, problems):
+    if not isinstance(values, list) or not values:
+        problems.append(f"{where}: expected a non-empty list")
+        return ()
+    return tuple(_text(value, f"{where}[{i}]", problems) for i, value in enumerate(values))
+
+
+def load_content(directory=CONTENT_DIR):
+    problems = []
+
+    challenges = {}
+    challenge_ids = {}
+    for i, entry in _entries(_section(directory, "challenges.json", "challenges", problems),
+                             "challenges.json challenges", problems):
+        where = f"challenges.json challenges[{i}]"
+        text = _text(entry.get("text"), f"{where}.text", problems)
+        emoji = _text(entry.get("emoji"), f"{where}.emoji", problems)
+        challenge_id = entry.get("id")
+        if not isinstance(challenge_id, int) or isinstance(challenge_id, bool):
+            problems.append(f"{where}.id: expected an integer, got {challenge_id!r}")
+        elif challenge_id in challenge_ids.values():
+            problems.append(f"{where}.id: duplicate id {challenge_id}")
+        if text in challenges:
+            problems.append(f"{where}.text: duplicate challenge {text!r}")
+        challenges[text] = emoji
+        challenge_ids[text] = challenge_id
+    if not challenges:
+        problems.append("challenges.json: no challenges")
+
+    # Scenario titles and their tips are declared together, so the selectbox
+    # options and the tips lookup can no longer drift apart.
+    conflict_tips = {}
+    for i, entry in _entries(_section(directory, "conflicts.json", "scenarios", problems),
+                             "conflicts.json scenarios", problems):
+        where = f"conflicts.json scenarios[{i}]"
+        title = _text(entry.get("title"), f"{where}.title", problems)
+        if title == "Other":
+            problems.append(f"{where}.title: 'Other' is reserved for free-text input")
+        if title in conflict_tips:
+            problems.append(f"{where}.title: duplicate scenario {title!r}")
+        conflict_tips[title] = _text_list(entry.get("tips"), f"{where}.tips", problems)
+    if not conflict_tips:
+        problems.append("conflicts.json: no scenarios")
+
+    mindfulness_exercises = []
+    for i, entry in _entries(_section(directory, "mindfulness.json", "exercises", problems),
+                             "mindfulness.json exercises", problems):
+        where = f"mindfulness.json exercises[{i}]"
+        mindfulness_exercises.append((_text(entry.get("title"), f"{where}.title", problems),
+                                      _text(entry.get("text"), f"{where}.text", problems)))
+    journaling_prompts = _text_list(_section(directory, "journaling.json", "prompts", problems),
+                                    "journaling.json prompts", problems)
+    affirmations = _text_list(_section(directory, "affirmations.json", "affirmations", problems),
+                              "affirmations.json affirmations", problems)
+
+    if problems:
+        raise ContentError("Invalid content:\n" + "\n".join(problems))
+    return Content(
+        challenges=MappingProxyType(challenges),
+        challenge_ids=MappingProxyType(challenge_ids),
+        challenge_texts=MappingProxyType({challenge_id: text for text, challenge_id in challenge_ids.items()}),
+        conflict_scenarios=tuple(conflict_tips),
+        conflict_tips=MappingProxyType(conflict_tips),
+        conflicts_fingerprint=fingerprint(conflict_tips),
+        mindfulness_exercises=tuple(mindfulness_exercises),
+        journaling_prompts=journaling_prompts,
+        affirmations=affirmations,
+    )
+
+
+class ContentStore:
+    # Serves the current Content snapshot and reloads it when a file's mtime
+    # changes, checking at most once every check_interval seconds. A reload
+    # that fails validation keeps the last good snapshot and is reported in
+    # last_error; only the initial load raises.
+    def __init__(self, directory=CONTENT_DIR, check_interval=1.0):
+        self.directory = directory
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.mtimes = self._mtimes()
+        self.content = load_content(directory)
+        self.checked_at = time.monotonic()
+        self.last_error = None
+
+    def _mtimes(self):
+        return tuple(os.stat(os.path.join(self.directory, name)).st_mtime_ns for name in CONTENT_FILES)
+
+    def get(self):
+        if time.monotonic() - self.checked_at < self.check_interval:
+            return self.content
+        with self.lock:
+            now = time.monotonic()
+            if now - self.checked_at < self.check_interval:
+                return self.content
+            self.checked_at = now
+            try:
+                mtimes = self._mtimes()
+            except OSError as e:
+                self.last_error = e
+                return self.content
+            if mtimes != self.mtimes:
+                self.mtimes = mtimes
+                try:
+                    self.content = load_content(self.directory)
+                    self.last_error = None
+                except (OSError, ValueError) as e:
+                    self.last_error = e
+            return self.content
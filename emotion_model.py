@@ -0,0 +1,93 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+import metrics
+import profiling
+
+# Optional local emotion classifier for the Mood Detector. Needs transformers
+# and torch; it is only built when SYNAPSE_EMOTION_MODEL names a
+# text-classification model, e.g. j-hartmann/emotion-english-distilroberta-base.
+
+# Model labels mapped onto the Mood Detector's emotions. Labels not listed here
+# give no answer and the keyword/VADER result is used instead.
+LABEL_EMOTIONS = {
+    "joy": "joyful",
+    "love": "joyful",
+    "sadness": "sad",
+    "anger": "angry",
+    "disgust": "angry",
+    "fear": "scared",
+    "neutral": "contemplative",
+    "surprise": "contemplative",
+}
+
+
+class EmotionClassifier:
+    # Requests from every session go through one queue. A single worker thread
+    # drains up to max_batch of them (waiting at most max_wait_ms for the batch
+    # to fill) and runs them as one forward pass.
+    def __init__(self, model_name, quantize=False, max_batch=16, max_wait_ms=10):
+        transformers = profiling.lazy_import("transformers")
+        self.pipe = transformers.pipeline("text-classification", model=model_name, device=-1)
+        if quantize:
+            torch = profiling.lazy_import("torch")
+            self.pipe.model = torch.quantization.quantize_dynamic(self.pipe.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def warm_up(self):
+        self.pipe(["Warming up the emotion model."] * self.max_batch, batch_size=self.max_batch, truncation=True)
+
+    def submit(self, text):
+        future = Future()
+        self.requests.put((text, future))
+        return future
+
+    def classify(self, text, budget):
+        # Returns None when the answer doesn't arrive within budget seconds or
+        # the model fails, so the caller can fall back to the keyword/VADER
+        # classification.
+        future = self.submit(text)
+        try:
+            with metrics.timed("emotion_model"):
+                return future.result(timeout=budget)
+        except TimeoutError:
+            metrics.record_error("emotion_model", "budget_exceeded")
+            future.cancel()
+            return None
+        except Exception as e:
+            metrics.record_error("emotion_model", type(e).__name__)
+            return None
+
+    def _next_batch(self):
+        batch = [self.requests.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # Requests whose caller already gave up are dropped here.
+        return [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            texts = [text for text, _ in batch]
+            try:
+                outputs = self.pipe(texts, batch_size=len(texts), truncation=True)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), output in zip(batch, outputs):
+                future.set_result(LABEL_EMOTIONS.get(output["label"].lower()))
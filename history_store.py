@@ -0,0 +1,232 @@
+import atexit
+import datetime
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import metrics
+
+# Durable per-user history: which challenges were completed, every mood
+# analysis and the mandalas saved to the gallery, keyed by compact integers (user key, content challenge id,
+# emotion index) rather than by the challenge text.
+#
+# Writes never block the caller. They go onto a queue and a single writer
+# thread commits them in batches, one transaction per batch. The same
+# transaction keeps the aggregates current: the streak per user, and mood
+# sums per user and week. A history view reads those few rows and never
+# rescans the event tables.
+#
+# SQLite runs in WAL mode, so reads are never blocked by the writer. They
+# share one connection guarded by a lock: Streamlit runs each rerun on a new
+# thread, so a connection per thread would leak one per rerun, and these
+# reads are single-row lookups that don't need more.
+
+DATA_DIR = os.getenv("SYNAPSE_DATA_DIR", "data")
+DB_PATH = os.getenv("SYNAPSE_HISTORY_DB", os.path.join(DATA_DIR, "history.sqlite3"))
+
+# Stored as the index in this tuple; only ever append to it.
+EMOTIONS = ("joyful", "sad", "angry", "scared", "unwell", "contemplative")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    user_id INTEGER NOT NULL,
+    challenge_id INTEGER NOT NULL,
+    completed INTEGER NOT NULL,
+    at INTEGER NOT NULL,
+    PRIMARY KEY (user_id, challenge_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS moods (
+    user_id INTEGER NOT NULL,
+    at INTEGER NOT NULL,
+    emotion INTEGER NOT NULL,
+    compound REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS moods_user_at ON moods (user_id, at);
+CREATE TABLE IF NOT EXISTS streaks (
+    user_id INTEGER PRIMARY KEY,
+    current INTEGER NOT NULL,
+    longest INTEGER NOT NULL,
+    last_day INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mood_weeks (
+    user_id INTEGER NOT NULL,
+    week INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    compound_sum REAL NOT NULL,
+    PRIMARY KEY (user_id, week)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS mandalas (
+    user_id INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    at INTEGER NOT NULL,
+    PRIMARY KEY (user_id, digest)
+) WITHOUT ROWID;
+"""
+
+# A streak counts consecutive days with at least one completion. Unticking a
+# challenge later doesn't take the day back, and a late event for an earlier
+# day leaves the streak alone.
+_NEXT_STREAK = """CASE
+    WHEN excluded.last_day <= last_day THEN current
+    WHEN excluded.last_day = last_day + 1 THEN current + 1
+    ELSE 1 END"""
+UPSERT_STREAK = f"""
+INSERT INTO streaks (user_id, current, longest, last_day) VALUES (?, 1, 1, ?)
+ON CONFLICT (user_id) DO UPDATE SET
+    current = {_NEXT_STREAK},
+    longest = MAX(longest, {_NEXT_STREAK}),
+    last_day = MAX(last_day, excluded.last_day)
+"""
+UPSERT_COMPLETION = """
+INSERT INTO completions (user_id, challenge_id, completed, at) VALUES (?, ?, ?, ?)
+ON CONFLICT (user_id, challenge_id) DO UPDATE SET completed = excluded.completed, at = excluded.at
+"""
+UPSERT_MOOD_WEEK = """
+INSERT INTO mood_weeks (user_id, week, count, compound_sum) VALUES (?, ?, 1, ?)
+ON CONFLICT (user_id, week) DO UPDATE SET count = count + 1, compound_sum = compound_sum + excluded.compound_sum
+"""
+
+_STOP = object()
+
+
+def user_key(token):
+    # A 63-bit integer for an opaque per-user token, so the tables never
+    # store the token itself.
+    return int.from_bytes(hashlib.sha1(token.encode("utf-8")).digest()[:8], "big") >> 1
+
+
+def day_number(at):
+    return datetime.date.fromtimestamp(at).toordinal()
+
+
+def week_number(at):
+    # Ordinal of the Monday the week starts on.
+    day = day_number(at)
+    return day - datetime.date.fromordinal(day).weekday()
+
+
+class HistoryStore:
+    def __init__(self, path=DB_PATH, batch_size=256, flush_interval=0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        connection = self._connect()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        connection.close()
+        self.reader = self._connect()
+        self.reader_lock = threading.Lock()
+        self.pending = queue.Queue()
+        self.last_error = None
+        self.writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _read(self, sql, parameters):
+        with self.reader_lock:
+            return self.reader.execute(sql, parameters).fetchall()
+
+    # Writes: queued, return immediately.
+
+    def record_completion(self, user_id, challenge_id, completed, at=None):
+        self.pending.put(("completion", user_id, challenge_id, bool(completed), at or time.time()))
+
+    def record_mood(self, user_id, emotion, compound, at=None):
+        self.pending.put(("mood", user_id, EMOTIONS.index(emotion), float(compound), at or time.time()))
+
+    def record_mandala(self, user_id, digest, at=None):
+        self.pending.put(("mandala", user_id, digest, at or time.time()))
+
+    def _apply(self, connection, event):
+        if event[0] == "completion":
+            _, user_id, challenge_id, completed, at = event
+            connection.execute(UPSERT_COMPLETION, (user_id, challenge_id, int(completed), int(at)))
+            if completed:
+                connection.execute(UPSERT_STREAK, (user_id, day_number(at)))
+        elif event[0] == "mandala":
+            _, user_id, digest, at = event
+            connection.execute("INSERT OR IGNORE INTO mandalas (user_id, digest, at) VALUES (?, ?, ?)",
+                               (user_id, digest, int(at)))
+        else:
+            _, user_id, emotion, compound, at = event
+            connection.execute("INSERT INTO moods (user_id, at, emotion, compound) VALUES (?, ?, ?, ?)",
+                               (user_id, int(at), emotion, compound))
+            connection.execute(UPSERT_MOOD_WEEK, (user_id, week_number(at), compound))
+
+    def _write_loop(self):
+        connection = self._connect()
+        stopping = False
+        while not stopping:
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.pending.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stopping = True
+            events = [event for event in batch if event is not _STOP]
+            try:
+                with metrics.timed("history_write_batch"), connection:
+                    for event in events:
+                        self._apply(connection, event)
+            except sqlite3.Error as e:
+                self.last_error = e
+                metrics.record_error("history_store", type(e).__name__)
+            finally:
+                for _ in batch:
+                    self.pending.task_done()
+        connection.close()
+
+    def flush(self):
+        self.pending.join()
+
+    def close(self):
+        if self.writer.is_alive():
+            self.pending.put(_STOP)
+            self.writer.join()
+        with self.reader_lock:
+            self.reader.close()
+
+    # Reads.
+
+    def completed_challenges(self, user_id):
+        rows = self._read(
+            "SELECT challenge_id FROM completions WHERE user_id = ? AND completed = 1 ORDER BY at", (user_id,)
+        )
+        return [challenge_id for (challenge_id,) in rows]
+
+    def streak(self, user_id, today=None):
+        # (current, longest); the current streak only counts if it reached
+        # today or yesterday.
+        rows = self._read("SELECT current, longest, last_day FROM streaks WHERE user_id = ?", (user_id,))
+        if not rows:
+            return 0, 0
+        [(current, longest, last_day)] = rows
+        if day_number(today or time.time()) - last_day > 1:
+            current = 0
+        return current, longest
+
+    def weekly_moods(self, user_id, weeks=12):
+        # [(monday, mean compound, analyses), ...], oldest first.
+        rows = self._read(
+            "SELECT week, compound_sum / count, count FROM mood_weeks WHERE user_id = ? ORDER BY week DESC LIMIT ?",
+            (user_id, weeks),
+        )
+        return [(datetime.date.fromordinal(week), mean, count) for week, mean, count in reversed(rows)]
+
+    def mandalas(self, user_id):
+        # Stroke digests (see mandala_render), oldest first.
+        rows = self._read("SELECT digest FROM mandalas WHERE user_id = ? ORDER BY at, digest", (user_id,))
+        return [digest for (digest,) in rows]
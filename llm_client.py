@@ -0,0 +1,346 @@
+import json
+import queue
+import random
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    pass
+
+
+class FirstTokenTimeout(Exception):
+    pass
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Cancellation:
+    # Lets one thread stop a stream another thread is reading. Before the
+    # response exists it stops retries and backoff sleeps; once it exists the
+    # socket is shut down, which wakes a read blocked on it (closing the
+    # response alone doesn't), and the connection is dropped, not pooled.
+    def __init__(self):
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.response = None
+
+    def is_set(self):
+        return self.event.is_set()
+
+    def wait(self, timeout):
+        return self.event.wait(timeout)
+
+    def attach(self, response):
+        with self.lock:
+            self.response = response
+            if self.event.is_set():
+                _shutdown(response)
+
+    def detach(self):
+        with self.lock:
+            self.response = None
+
+    def cancel(self):
+        with self.lock:
+            self.event.set()
+            if self.response is not None:
+                _shutdown(self.response)
+
+
+def _shutdown(response):
+    sock = getattr(getattr(response.raw, "_connection", None), "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+def normalize_payload(payload):
+    # Payloads that differ only in key order or whitespace share a cache entry.
+    def normalize(value):
+        if isinstance(value, str):
+            return " ".join(value.split())
+        if isinstance(value, dict):
+            return {key: normalize(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(item) for item in value]
+        return value
+    return json.dumps(normalize(payload), sort_keys=True, separators=(",", ":"))
+
+
+def is_upstream_failure(error):
+    # Only errors that say the upstream is down or overloaded count against
+    # the circuit breaker; a 4xx is a problem with our request, not with it.
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    response = getattr(error, "response", None)
+    return response is not None and (response.status_code >= 500 or response.status_code == 429)
+
+
+def extract_generated_text(result):
+    if isinstance(result, list) and result:
+        result = result[0]
+    if isinstance(result, dict):
+        return result["generated_text"]
+    raise KeyError("generated_text")
+
+
+def _sse_tokens(response):
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        event = json.loads(data)
+        token = event.get("token") or {}
+        if not token.get("special"):
+            yield token.get("text", "")
+
+
+def stream_with_deadline(chunks, first_token_timeout, on_cancel=None):
+    # Pulls chunks on a helper thread so the caller can give up if the first
+    # one is late (raises FirstTokenTimeout). Closing the returned generator,
+    # e.g. when Streamlit stops the script for a rerun, calls on_cancel; pass
+    # a Cancellation's cancel there so the upstream request is actually
+    # closed instead of running on in the helper thread.
+    cancel = threading.Event()
+    handoff = queue.Queue()
+    done = object()
+
+    def pump():
+        try:
+            for chunk in chunks:
+                if cancel.is_set():
+                    break
+                handoff.put(chunk)
+        except Exception as e:
+            handoff.put(e)
+        finally:
+            chunks.close()
+            handoff.put(done)
+
+    threading.Thread(target=pump, daemon=True).start()
+    try:
+        timeout = first_token_timeout
+        while True:
+            try:
+                item = handoff.get(timeout=timeout)
+            except queue.Empty:
+                raise FirstTokenTimeout(f"No response within {first_token_timeout}s")
+            timeout = None
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancel.set()
+        if on_cancel is not None:
+            on_cancel()
+
+
+class TTLCache:
+    def __init__(self, max_entries=256, ttl=600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class CircuitBreaker:
+    # Opens after failure_threshold consecutive failed calls and rejects calls
+    # for reset_timeout seconds; after that a single trial call is let through
+    # and its outcome closes or re-opens the circuit.
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def release(self):
+        # A trial call that ended without telling us anything about the
+        # upstream (it was cancelled) lets the next call try instead.
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class LLMClient:
+    RETRY_STATUSES = {429, 503}
+
+    def __init__(self, url, token=None, connect_timeout=3.05, read_timeout=30, max_retries=3,
+                 backoff_base=0.5, backoff_cap=8, pool_size=10, cache_size=256, cache_ttl=600,
+                 failure_threshold=5, reset_timeout=30):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.cache = TTLCache(cache_size, cache_ttl)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def query(self, payload):
+        key = normalize_payload(payload)
+        cached = self.cache.get(key)
+        metrics.record_cache("llm_response", cached is not None)
+        if cached is not None:
+            return cached
+        with metrics.timed("llm_query"):
+            response = self.post(payload)
+            result = response.json()
+        self.cache.set(key, result)
+        return result
+
+    def stream(self, payload, cancel=None):
+        # Yields generated text as it arrives. Understands the text-generation
+        # server-sent events ({"token": {"text": ...}} per data: line) and
+        # falls back to raw chunked text for endpoints that don't send SSE.
+        # A finished stream is cached like a query() result, so a repeat of
+        # the same payload replays instantly. cancel is an optional
+        # Cancellation another thread can use to stop the request.
+        key = normalize_payload(payload)
+        cached = self.cache.get(key)
+        metrics.record_cache("llm_response", cached is not None)
+        if cached is not None:
+            yield extract_generated_text(cached)
+            return
+        with metrics.timed("llm_stream_connect"):
+            response = self.post(dict(payload, stream=True), stream=True, cancel=cancel)
+        if cancel is not None:
+            cancel.attach(response)
+        pieces = []
+        try:
+            if response.headers.get("Content-Type", "").startswith("text/event-stream"):
+                chunks = _sse_tokens(response)
+            else:
+                chunks = response.iter_content(chunk_size=None, decode_unicode=True)
+            for chunk in chunks:
+                if chunk:
+                    pieces.append(chunk)
+                    yield chunk
+        finally:
+            if cancel is not None:
+                cancel.detach()
+            response.close()
+        if cancel is None or not cancel.is_set():
+            self.cache.set(key, [{"generated_text": "".join(pieces)}])
+
+    def post(self, payload, stream=False, cancel=None):
+        if not self.breaker.allow():
+            metrics.record_error("llm", "circuit_open")
+            raise CircuitOpenError(f"Circuit open for {self.url}")
+        try:
+            response = self._post_with_retries(payload, stream, cancel)
+        except Cancelled:
+            self.breaker.release()
+            raise
+        except requests.exceptions.RequestException as e:
+            metrics.record_error("llm", type(e).__name__)
+            if is_upstream_failure(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+        return response
+
+    def _post_with_retries(self, payload, stream, cancel=None):
+        # A request already waiting for response headers can't be interrupted;
+        # cancel takes effect when it returns, and between attempts.
+        attempt = 0
+        while True:
+            if cancel is not None and cancel.is_set():
+                raise Cancelled()
+            try:
+                response = self.session.post(self.url, json=payload, timeout=self.timeout, stream=stream)
+            except requests.exceptions.ConnectionError:
+                if attempt >= self.max_retries:
+                    raise
+                metrics.record_error("llm", "retried_connection")
+                self._sleep_before_retry(attempt, None, cancel)
+            else:
+                if response.status_code not in self.RETRY_STATUSES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response
+                metrics.record_error("llm", f"retried_http_{response.status_code}")
+                retry_after = response.headers.get("Retry-After")
+                response.close()
+                self._sleep_before_retry(attempt, retry_after, cancel)
+            attempt += 1
+
+    def _sleep_before_retry(self, attempt, retry_after, cancel=None):
+        # Full jitter, so sessions that failed together don't retry together.
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        if retry_after is not None and retry_after.isdigit():
+            delay = max(delay, min(self.backoff_cap, float(retry_after)))
+        if cancel is None:
+            time.sleep(delay)
+        elif cancel.wait(delay):
+            raise Cancelled()
+
+    def close(self):
+        self.session.close()
@@ -1,35 +1,61 @@
+# profiling comes first so the imports below are timed in profiling mode.
+import profiling
+profiling.mark_script_start()
 import streamlit as st
 import random
 import os
-import requests
-import streamlit.components.v1 as components
-from transformers import pipeline
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import time
+import functools
+import secrets
 from dotenv import load_dotenv
+import metrics
+import assets
+import mood
+import mandala
+
+run_started = time.perf_counter()
+# True while the whole script runs; a fragment rerun calls its function after
+# the script has finished, so only those runs are reported as fragment scopes.
+full_run = True
 
 st.set_page_config(page_title="SynapseAI", page_icon="newlogo.ico", layout="wide")
+metrics.start_exporters()
 
-st.markdown(
-    """
-    <link rel="preconnect" href="https://fonts.googleapis.com">
-    <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
-    <link href="https://fonts.googleapis.com/css2?family=Comic+Relief&display=swap" rel="stylesheet">
-    """,
-    unsafe_allow_html=True,
-)
+# The font is self-hosted once build_assets.py has run; the Google Fonts link
+# is only the fallback for a checkout without built assets.
+if assets.font_face():
+    st.markdown(f"<style>{assets.font_face()}</style>", unsafe_allow_html=True)
+else:
+    st.markdown(
+        """
+        <link rel="preconnect" href="https://fonts.googleapis.com">
+        <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
+        <link href="https://fonts.googleapis.com/css2?family=Comic+Relief&display=swap" rel="stylesheet">
+        """,
+        unsafe_allow_html=True,
+    )
 
 API_TOKEN = os.getenv("HUGGINGFACE_API_TOKEN")
-API_URL = "https://api-inference.huggingface.co/models/meta-llama/Llama-2-7b-chat-hf"
-
-headers = {"Authorization": f"Bearer {API_TOKEN}"}
+# SYNAPSE_LLM_URL points the advice path at another endpoint, e.g. a local
+# stand-in server while testing.
+API_URL = os.getenv("SYNAPSE_LLM_URL", "https://api-inference.huggingface.co/models/meta-llama/Llama-2-7b-chat-hf")
+LLM_ENABLED = bool(API_TOKEN or os.getenv("SYNAPSE_LLM_URL"))
+# Advice is streamed token by token unless SYNAPSE_LLM_STREAM=0. If the first
+# token takes longer than the deadline the static tips are shown instead.
+LLM_STREAM = os.getenv("SYNAPSE_LLM_STREAM", "1") != "0"
+LLM_FIRST_TOKEN_DEADLINE = float(os.getenv("SYNAPSE_LLM_FIRST_TOKEN_DEADLINE", "2.0"))
+
+# One pooled client per process: keep-alive connections, timeouts, retries,
+# a circuit breaker and a response cache are shared by every session.
+@st.cache_resource
+def get_llm_client():
+    llm_client = profiling.lazy_import("llm_client")
+    return llm_client.LLMClient(API_URL, token=API_TOKEN)
 
 def query(payload):
+    requests = profiling.lazy_import("requests")
     try:
-        response = requests.post(API_URL, headers=headers, json=payload)
-        response.raise_for_status()
-        return response.json()
+        return get_llm_client().query(payload)
     except requests.exceptions.RequestException as e:
         st.error(f"Request Error: {e}")
         return None
@@ -40,186 +66,373 @@ def query(payload):
         st.error(f"Error: {e}")
         return None
 
+def advice_payload(description, scenario):
+    prompt = (
+        "[INST] <<SYS>>\nYou are a kind, practical wellbeing assistant for school students. "
+        "Give short, empathetic advice as 3 to 5 bullet points.\n<</SYS>>\n\n"
+        f"A student describes this situation: {description}\n"
+        f"It is closest to: {scenario} [/INST]"
+    )
+    return {"inputs": prompt, "parameters": {"max_new_tokens": 300, "return_full_text": False}}
+
+def llm_advice(description, scenario):
+    result = query(advice_payload(description, scenario))
+    if result is None:
+        return None
+    llm_client = profiling.lazy_import("llm_client")
+    try:
+        return llm_client.extract_generated_text(result).strip() or None
+    except KeyError:
+        st.error("Error: Unexpected response format from the API.")
+        return None
+
+def stream_advice(description, scenario):
+    llm_client = profiling.lazy_import("llm_client")
+    cancellation = llm_client.Cancellation()
+    chunks = get_llm_client().stream(advice_payload(description, scenario), cancellation)
+    return llm_client.stream_with_deadline(chunks, LLM_FIRST_TOKEN_DEADLINE, on_cancel=cancellation.cancel)
+
+def render_streamed_advice(description, scenario):
+    requests = profiling.lazy_import("requests")
+    llm_client = profiling.lazy_import("llm_client")
+    tokens = stream_advice(description, scenario)
+    try:
+        first_token = next(tokens)
+    except StopIteration:
+        return False
+    except llm_client.FirstTokenTimeout:
+        tokens.close()
+        return False
+    except requests.exceptions.RequestException as e:
+        st.error(f"Request Error: {e}")
+        return False
+    except Exception as e:
+        # A malformed first event, or a cached reply without generated text.
+        tokens.close()
+        st.error(f"The advice stream was interrupted: {e}")
+        return False
+    def remaining():
+        yield first_token
+        yield from tokens
+    # Closing in finally also covers Streamlit interrupting write_stream for a
+    # rerun, which cancels the upstream request. A stream that breaks off
+    # part way (a dropped connection, a malformed event) falls back to the
+    # static tips below what was already shown.
+    try:
+        st.write_stream(remaining())
+    except Exception as e:
+        st.error(f"The advice stream was interrupted: {e}")
+        return False
+    finally:
+        tokens.close()
+    return True
+
+# Each interactive feature is its own fragment: a widget inside it reruns only
+# that function, not the whole page. Run times are reported per scope when
+# SYNAPSE_PROFILE_RERUNS=1, so "full" and "fragment:<name>" can be compared;
+# inside a full run the section is already part of "full" and is not reported.
+def section(name):
+    def decorate(func):
+        @functools.wraps(func)
+        def run():
+            if full_run:
+                func()
+                return
+            started = time.perf_counter()
+            try:
+                with metrics.timed(f"fragment:{name}"):
+                    func()
+            finally:
+                profiling.report_rerun(f"fragment:{name}", started)
+        return st.fragment(run)
+    return decorate
+
 def local_css(file_name):
-    with open(file_name) as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+    with metrics.timed("css_load"):
+        st.markdown(f"<style>{assets.read_text(file_name)}</style>", unsafe_allow_html=True)
+
+# Serves the display-sized, hashed copies from static/ when they have been
+# built, instead of sending the full-size originals through st.image.
+def show_image(file_name, width, caption=None, lazy=False):
+    with metrics.timed("image_load"):
+        tag = assets.image_html(file_name, caption, lazy)
+        if tag:
+            st.markdown(tag, unsafe_allow_html=True)
+        else:
+            st.image(file_name, caption=caption, width=width)
 
 local_css("style.css")
 
-analyzer = SentimentIntensityAnalyzer()
-
-joyful_keywords = ["happy", "excited", "joy", "delighted", "thrilled", "wonderful", "amazing", "fantastic"]
-sad_keywords = ["sad", "unhappy", "depressed", "miserable", "heartbroken", "lonely", "grief", "disappointed"]
-angry_keywords = ["angry", "furious", "irritated", "frustrated", "mad", "rage", "annoyed"]
-scared_keywords = ["scared", "afraid", "nervous", "anxious", "terrified", "worried", "fear", "panic"]
-contemplative_keywords = ["thinking", "reflecting", "pondering", "considering", "wondering", "introspective", "meditative"]
-unwell_keywords = ["unwell", "sick", "ill", "poorly", "not feeling well", "discomfort"]
-
-challenges = {
-    "Compliment a classmate.": "😊",
-    "Offer to help a friend with homework.": "🤝",
-    "Write a kind note to family.": "💌",
-    "Hold the door open for someone.": "🚪",
-    "Smile at a stranger.": "😀",
-    "Help a neighbor with yard work.": "🏡",
-    "Leave an anonymous encouraging message.": "📝",
-    "Pick up litter.": "🗑️",
-    "Thank school staff.": "🙏",
-    "Offer a seat to someone.": "💺",
-    "Make someone laugh.": "😂",
-    "Send a positive text.": "📱",
-    "Help a sibling with a task.": "🙌",
-    "Share treats with your class.": "🍪",
-    "Write a positive review for a local business.": "⭐",
-    "Donate clothes or toys.": "🎁",
-    "Leave a kind comment online.": "💬",
-    "Help a friend study.": "📚",
-    "Be patient with someone having a bad day.": "😌",
-    "Forgive someone.": "❤️",
-    "Plant a sapling.": "🌱",
-    "Visit a nursing home.": "👵👴",
-    "Volunteer at a charity.": "🙋",
-    "Help a pet owner.": "🐾",
-    "Help a teacher after class.": "🍎",
-    "Be respectful to everyone.": " 🗣️",
-    "Listen attentively.": "👂",
-    "Practice gratitude.": "🙏",
-    "Be kind to yourself.": "🧘",
-    "Practice self-care.": "🛀",
-    "Take a break from social media.": "📵",
-    "Spend time in nature.": "🌳",
-    "Do something that makes you happy.": "😄",
-    "Get a good night's sleep.": "😴",
-    "Eat a healthy meal.": "🥗",
-    "Exercise.": "🏃",
-    "Drink plenty of water.": "💧",
-    "Take care of your mental health.": "🧠",
-}
-
-st.image("banner.png", width=541)
+# Built once per process and shared by every session; Streamlit reruns the
+# whole script on each interaction, so nothing heavy should be built inline.
+@st.cache_resource
+def get_analyzer():
+    vader = profiling.lazy_import("vaderSentiment.vaderSentiment")
+    return vader.SentimentIntensityAnalyzer()
+
+EMOTION_MODEL = os.getenv("SYNAPSE_EMOTION_MODEL")
+EMOTION_MODEL_QUANTIZE = os.getenv("SYNAPSE_EMOTION_QUANTIZE") == "1"
+EMOTION_MODEL_BUDGET = float(os.getenv("SYNAPSE_EMOTION_BUDGET_MS", "150")) / 1000
+
+@st.cache_resource
+def get_emotion_classifier():
+    if not EMOTION_MODEL:
+        return None
+    emotion_model = profiling.lazy_import("emotion_model")
+    classifier = emotion_model.EmotionClassifier(EMOTION_MODEL, quantize=EMOTION_MODEL_QUANTIZE)
+    classifier.warm_up()
+    return classifier
+
+SCENARIO_INDEX_CACHE_DIR = os.getenv("SYNAPSE_INDEX_CACHE_DIR", ".cache")
+# Best-match similarity below this floor counts as "no good match".
+SCENARIO_MATCH_FLOOR = float(os.getenv("SYNAPSE_SCENARIO_MATCH_FLOOR", "0.1"))
+
+@st.cache_resource
+def get_content_store():
+    content_store = profiling.lazy_import("content_store")
+    return content_store.ContentStore()
+
+# Follows the content store: every lookup passes the current content
+# fingerprint, so a reload with changed tips invalidates the index on the next
+# query (and updates it incrementally) without anything having to clear the
+# resource cache.
+@st.cache_resource
+def get_scenario_index():
+    scenario_index = profiling.lazy_import("scenario_index")
+    return scenario_index.ScenarioIndexCache(SCENARIO_INDEX_CACHE_DIR)
+
+# Mood analysis of long entries runs in a bounded process pool so it doesn't
+# hold the GIL against other sessions. Short entries are cheaper to score
+# inline than to send to a worker. SYNAPSE_POOL_WORKERS=0 turns the pool off.
+POOL_WORKERS = int(os.getenv("SYNAPSE_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+POOL_MAX_PENDING = int(os.getenv("SYNAPSE_POOL_MAX_PENDING", str(POOL_WORKERS * 4)))
+POOL_DEADLINE = float(os.getenv("SYNAPSE_POOL_DEADLINE_MS", "5000")) / 1000
+POOL_MIN_CHARS = int(os.getenv("SYNAPSE_POOL_MIN_CHARS", "2000"))
+
+@st.cache_resource
+def get_worker_pool():
+    if POOL_WORKERS <= 0:
+        return None
+    worker_pool = profiling.lazy_import("worker_pool")
+    pool = worker_pool.WorkerPool(POOL_WORKERS, POOL_MAX_PENDING)
+    pool.warm_up()
+    return pool
+
+def run_mood_analysis(text, model_emotion=None):
+    pool = get_worker_pool()
+    if pool is None or len(text) < POOL_MIN_CHARS:
+        return mood.analyze_mood(text, get_analyzer(), model_emotion=model_emotion)
+    worker_pool = profiling.lazy_import("worker_pool")
+    return pool.run(worker_pool.analyze_mood, text, model_emotion, deadline=POOL_DEADLINE)
+
+# Completed challenges and mood history are kept on disk per user, written in
+# the background. SYNAPSE_HISTORY=0 keeps them in the session only.
+HISTORY_ENABLED = os.getenv("SYNAPSE_HISTORY", "1") != "0"
+
+@st.cache_resource
+def get_history_store():
+    if not HISTORY_ENABLED:
+        return None
+    history_store = profiling.lazy_import("history_store")
+    return history_store.HistoryStore()
+
+# There are no accounts: a random token in the page URL identifies the
+# browser, so a bookmarked link brings the same history back. Only a hash of
+# the token is stored.
+def current_user_id():
+    if "user_id" not in st.session_state:
+        history_store = profiling.lazy_import("history_store")
+        token = st.query_params.get("u")
+        if not token:
+            token = secrets.token_urlsafe(12)
+            st.query_params["u"] = token
+        st.session_state.user_id = history_store.user_key(token)
+    return st.session_state.user_id
+
+# Load and warm up the optional local model on the first run rather than on
+# the first button press.
+get_emotion_classifier()
+
+content = get_content_store().get()
+challenges = content.challenges
+if HISTORY_ENABLED:
+    current_user_id()
+
+show_image("banner.png", width=541)
 st.title("SynapseAI: *Wellbeing for Students, by Students.*")
-st.image("kindness.png", caption="Spreading Kindness 💖", width=100)
+show_image("kindness.png", width=100, caption="Spreading Kindness 💖")
 st.write("In today's fast-paced world, students face numerous challenges to their wellbeing, including work overload, social tensions, and the pressures of academic life. That's why we developed SynapseAI, a platform designed specifically for students. Here you'll find AI-powered conflict resolution support, journaling prompts for self-reflection, mindfulness tips and kindness challenges to help you find your calm and peace of mind in your everyday life.")
-if "completed_tasks" not in st.session_state:
-    st.session_state.completed_tasks = {}
-
-if st.button("Get My Challenge! 🎁"):
-    chosen_challenge = random.choice(list(challenges.keys()))
-    st.write(f"{challenges[chosen_challenge]} {chosen_challenge}")
-    if chosen_challenge not in st.session_state.completed_tasks:
-        st.session_state.completed_tasks[chosen_challenge] = False
-    checkbox_key = f"checkbox_{chosen_challenge}"
-
-    def update_completion(chosen_challenge=chosen_challenge):
-        st.session_state.completed_tasks[chosen_challenge] = st.session_state[checkbox_key]
-
-    completed = st.checkbox("I completed this task! ✅", value=st.session_state.completed_tasks[chosen_challenge],
-                            key=checkbox_key, on_change=update_completion)
-st.subheader("Completed Tasks:")
-for task, completed in st.session_state.completed_tasks.items():
-        if completed:
-            st.write(f"- {task} {challenges[task]}")
+@section("challenges")
+def challenge_section():
+    # challenge id -> completed, seeded from the history store once per session
+    if "completed_tasks" not in st.session_state:
+        store = get_history_store()
+        completed_ids = store.completed_challenges(current_user_id()) if store else []
+        st.session_state.completed_tasks = dict.fromkeys(completed_ids, True)
+
+    if st.button("Get My Challenge! 🎁"):
+        chosen_challenge = random.choice(list(challenges.keys()))
+        challenge_id = content.challenge_ids[chosen_challenge]
+        st.write(f"{challenges[chosen_challenge]} {chosen_challenge}")
+        if challenge_id not in st.session_state.completed_tasks:
+            st.session_state.completed_tasks[challenge_id] = False
+        checkbox_key = f"checkbox_{challenge_id}"
+
+        # Only queues the write; the history store commits it in the background.
+        def update_completion(challenge_id=challenge_id):
+            completed = st.session_state[checkbox_key]
+            st.session_state.completed_tasks[challenge_id] = completed
+            store = get_history_store()
+            if store:
+                store.record_completion(current_user_id(), challenge_id, completed)
+
+        completed = st.checkbox("I completed this task! ✅", value=st.session_state.completed_tasks[challenge_id],
+                                key=checkbox_key, on_change=update_completion)
+    st.subheader("Completed Tasks:")
+    for challenge_id, completed in st.session_state.completed_tasks.items():
+            task = content.challenge_texts.get(challenge_id)
+            if completed and task:
+                st.write(f"- {task} {challenges[task]}")
+
+challenge_section()
 
 st.write("----------------------------------------------")
 
-st.write("**Mood Detector**: This tool analyzes your text to identify your mood and offers helpful suggestions for managing your emotions.")
-experience = st.text_area("")
-
-if st.button("Analyze My Mood 🔍"):
-    if experience:
-        try:
-            scores = analyzer.polarity_scores(experience)
-            compound = scores['compound']
-            pos = scores['pos']
-            neg = scores['neg']
-            experience_lower = experience.lower()
-
-            emotion = "contemplative"
-            tips = ["In a contemplative mood? Engage with a journaling prompt, or explore our mandala art section. Consider reading a thought-provoking article."]
-
-            if any(keyword in experience_lower for keyword in joyful_keywords):
-                emotion = "joyful"
-                tips = ["You seem to be feeling joyous! Your mood can radiate and affect others too, so keep that positive energy up! ⭐"]
-            elif any(keyword in experience_lower for keyword in sad_keywords):
-                emotion = "sad"
-                tips = ["I'm sensing sadness. Try some mandala art, or a few positive affirmations. Perhaps listen to calming nature sounds on YouTube. 🌿"]
-            elif any(keyword in experience_lower for keyword in angry_keywords):
-                emotion = "angry"
-                tips = ["It sounds like you're angry. Use our conflict resolution tool, or try a mindfulness exercise. Consider a short, brisk walk outside. 🚶"]
-            elif any(keyword in experience_lower for keyword in scared_keywords):
-                emotion = "scared"
-                tips = ["I sense fear. Practice a grounding mindfulness exercise, or explore some positive affirmations. Maybe try a guided relaxation video online."]
-            elif any(keyword in experience_lower for keyword in unwell_keywords):
-                emotion = "unwell"
-                tips = ["It sounds like you're not feeling well. Try to get some rest, and drink plenty of water."]
-
-            elif compound >= 0.5 and emotion == "contemplative":
-                emotion = "joyful"
-                tips = ["You seem to be feeling joyous! Your mood can radiate and affect others too, so keep that positive energy up! ⭐"]
-            elif compound <= -0.5 and emotion == "contemplative":
-                emotion = "sad"
-                tips = ["I'm sensing sadness. Try some mandala art, or a few positive affirmations. Perhaps listen to calming nature sounds on YouTube. 🌿"]
-            elif neg > 0.3 and emotion == "contemplative":
-                emotion = "angry"
-                tips = ["It sounds like you're angry. Use our conflict resolution tool, or try a mindfulness exercise. Consider a short, brisk walk outside. 🚶"]
-            elif pos < 0.2 and neg < 0.2 and compound < -0.2 and emotion == "contemplative":
-                emotion = "scared"
-                tips = ["I sense fear. Practice a grounding mindfulness exercise, or explore some positive affirmations. Maybe try a guided relaxation video online. 🎥"]
-            elif compound < -0.2 and neg > pos and emotion == "contemplative":
-                emotion = "unwell"
-                tips = ["It sounds like you're not feeling well. Try to get some rest, and drink plenty of water."]
-
-            st.write(f"Based on your input, you seem to be feeling {emotion}.")
-            for tip in tips:
-                st.write(f"- {tip}")
-
-            sentiment_data = {
-                "Positive": pos,
-                "Negative": neg,
-                "Compound": compound
-            }
-            st.subheader("Mood Analysis Breakdown 📊")
-            st.bar_chart(sentiment_data)
-
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
-    else:
-        st.write("Please share your mood to analyze its sentiment. 📖")
+def show_mood_result(result):
+    emotion = result["emotion"]
+    tips = result["tips"]
+    compound = result["scores"]['compound']
+    pos = result["scores"]['pos']
+    neg = result["scores"]['neg']
+
+    st.write(f"Based on your input, you seem to be feeling {emotion}.")
+    for tip in tips:
+        st.write(f"- {tip}")
+
+    sentiment_data = {
+        "Positive": pos,
+        "Negative": neg,
+        "Compound": compound
+    }
+    st.subheader("Mood Analysis Breakdown 📊")
+    st.bar_chart(sentiment_data)
+
+def show_sentence_timeline(results):
+    st.subheader("Your Mood, Sentence by Sentence 📈")
+    st.line_chart({"Compound": [result["scores"]["compound"] for result in results]})
+    st.dataframe(
+        {
+            "Emotion": [result["emotion"] for result in results],
+            "Compound": [result["scores"]["compound"] for result in results],
+            "Sentence": [result["text"] for result in results],
+        },
+        use_container_width=True,
+    )
+
+# Entries of at least SYNAPSE_MOOD_LONG_TEXT_CHARS are scored sentence by
+# sentence in chunks, on the worker pool when there is one, and the summary
+# and timeline are redrawn as each chunk comes back instead of after the last.
+MOOD_LONG_TEXT_CHARS = int(os.getenv("SYNAPSE_MOOD_LONG_TEXT_CHARS", "2000"))
+MOOD_SENTENCE_CHUNK = int(os.getenv("SYNAPSE_MOOD_SENTENCE_CHUNK", "16"))
+
+def sentence_results(sentences):
+    chunks = [sentences[i:i + MOOD_SENTENCE_CHUNK] for i in range(0, len(sentences), MOOD_SENTENCE_CHUNK)]
+    pool = get_worker_pool()
+    if pool is None:
+        for chunk in chunks:
+            yield mood.analyze_sentences(chunk, get_analyzer())
+        return
+    worker_pool = profiling.lazy_import("worker_pool")
+    yield from pool.imap(worker_pool.analyze_sentences, chunks, deadline=POOL_DEADLINE)
+
+def render_long_mood_analysis(sentences, model_emotion=None):
+    summary = st.empty()
+    timeline = st.empty()
+    results = []
+    result = None
+    for chunk in sentence_results(sentences):
+        results.extend(chunk)
+        result = mood.aggregate_sentences(results, model_emotion=model_emotion)
+        with summary.container():
+            show_mood_result(result)
+            if len(results) < len(sentences):
+                st.caption(f"Analyzed {len(results)} of {len(sentences)} sentences...")
+        with timeline.container():
+            show_sentence_timeline(results)
+    return result
+
+@section("mood")
+def mood_section():
+    st.write("**Mood Detector**: This tool analyzes your text to identify your mood and offers helpful suggestions for managing your emotions.")
+    experience = st.text_area("")
+
+    if st.button("Analyze My Mood 🔍"):
+        if experience:
+            worker_pool = profiling.lazy_import("worker_pool")
+            try:
+                classifier = get_emotion_classifier()
+                model_emotion = classifier.classify(experience, EMOTION_MODEL_BUDGET) if classifier else None
+                sentences = mood.split_sentences(experience) if len(experience) >= MOOD_LONG_TEXT_CHARS else []
+                with st.spinner("Analyzing your mood..."):
+                    if len(sentences) > 1:
+                        result = render_long_mood_analysis(sentences, model_emotion)
+                    else:
+                        result = run_mood_analysis(experience, model_emotion)
+                        show_mood_result(result)
+                store = get_history_store()
+                if store:
+                    store.record_mood(current_user_id(), result["emotion"], result["scores"]["compound"])
+
+            except worker_pool.PoolBusy:
+                st.warning("Lots of people are analyzing their mood right now. Please try again in a moment. 🙏")
+            except worker_pool.DeadlineExceeded:
+                st.warning("That took longer than expected. Try again, or share a shorter entry. ⏳")
+            except Exception as e:
+                st.error(f"An error occurred: {e}")
+        else:
+            st.write("Please share your mood to analyze its sentiment. 📖")
+
+mood_section()
+
+@section("progress")
+def progress_section():
+    store = get_history_store()
+    if store is None:
+        return
+    st.subheader("Your Progress 🌱")
+    user_id = current_user_id()
+    current, longest = store.streak(user_id)
+    left, right = st.columns(2)
+    left.metric("Kindness streak", f"{current} day{'' if current == 1 else 's'}")
+    right.metric("Longest streak", f"{longest} day{'' if longest == 1 else 's'}")
+    weeks = store.weekly_moods(user_id)
+    if weeks:
+        st.write("Your average mood by week, from -1 (low) to 1 (high):")
+        st.line_chart({"Mood": {monday.isoformat(): mean for monday, mean, count in weeks}})
+    st.button("Refresh 🔄", key="refresh_progress")
+
+progress_section()
 
 def mindfulness_section():
     st.subheader("Mindfulness Exercises 🧘")
     st.write("Need a break from the studies and a moment of calm? Discover simple yet effective mindfulness techniques to bring peace and focus to your mind. From deep breathing exercises to mindful observation, these tips can help you manage stress, increase self-awareness, and improve your overall well-being. Useful exercises:")
-    st.markdown("* __Deep Breathing:__ Sit comfortably. Close your eyes. Inhale slowly through your nose, exhale through your mouth. Repeat for 5-10 minutes, focusing on your breath.")
-    st.markdown("* __Body Scan:__ Sit or lie down. Close your eyes. Bring your attention to your body, starting with your toes. Notice any sensations as you slowly move your attention up to your head.")
-    st.markdown("* __Mindful Walking:__ Walk slowly. Pay attention to the sensations of your feet on the ground and your body's movement. Engage your senses and observe your surroundings.")
-    st.markdown("* __Five Senses Meditation:__ Sit comfortably. Close your eyes. Take a few moments to notice what you experience through each of your five senses: sight, sound, smell, taste, and touch.")
-    st.markdown("* __Mindful Observation:__ Choose an object. Observe it closely with all your senses. Notice its colors, shapes, textures, and any sounds or smells.")
-    st.image("girl.png", caption="Utilising Mindfulness", width=200)
+    for title, text in content.mindfulness_exercises:
+        st.markdown(f"* __{title}:__ {text}")
+    show_image("girl.png", width=200, caption="Utilising Mindfulness", lazy=True)
 
 def journaling_section():
     st.subheader("Journaling Prompts 📝")
     st.write("School got you stressed?  Take a moment for yourself with our curated journaling prompts. Reflect on your thoughts, feelings, and experiences with these thought-provoking questions. Journaling can help you gain clarity, reduce stress, and boost your well-being. Here are some thoughtful prompts to get you started:")
-    st.markdown("* What are you most grateful for today?")
-    st.markdown("* What are your strengths and weaknesses?")
-    st.markdown("* How are you feeling right now, and why?")
-    st.markdown("* What are you holding onto that you need to let go of?")
-    st.markdown("* What are your goals and dreams?")
-    st.markdown("* What challenges are you facing, and how can you overcome them?")
-    st.markdown("* What small things bring you happiness?")
-    st.markdown("* How can you be more present in your daily life?")
-    st.image("boy.png", caption="Acheiving Goals", width=200)
+    for prompt in content.journaling_prompts:
+        st.markdown(f"* {prompt}")
+    show_image("boy.png", width=200, caption="Acheiving Goals", lazy=True)
 
 def positive_section():
     st.subheader("Positive Affirmations ❤️")
     st.write("Need a boost of positivity? Our Positive Affirmations section is here to uplift and inspire you.  We've curated a collection of empowering statements to help you cultivate self-love, overcome challenges, and embrace your inner strength.  Read them daily, repeat them to yourself, and let these affirmations guide you towards a more positive and fulfilling mindset.")
-    st.markdown("* I am capable of achieving my goals.")
-    st.markdown("* I can handle any challenge that comes my way.")
-    st.markdown("* I am a strong and intelligent student.")
-    st.markdown("* I am focused and dedicated to my studies.")
-    st.markdown("* I embrace challenges as opportunities to learn.")
-    st.markdown("* I am kind and compassionate to myself.")
-    st.markdown("* I nourish myself with healthy habits.")
-    st.image("positive.png", caption="Self Encouragement", width=200)
+    for affirmation in content.affirmations:
+        st.markdown(f"* {affirmation}")
+    show_image("positive.png", width=200, caption="Self Encouragement", lazy=True)
 
 
 mindfulness_section()
@@ -229,272 +442,111 @@ positive_section()
 st.title("Conflict Resolutioner AI")
 st.write("Navigating work overload, procrastination, friendships, group projects, or misunderstandings with classmates? Our AI-powered conflict resolution assistant is here to help! Describe your situation, and our friendly AI will offer empathetic advice and practical strategies to help you resolve conflicts peacefully and maintain positive relationships.")
 
-conflict_scenarios = [
-    "I'm really anxious about an upcoming test.",
-    "I'm afraid I'm going to fail my exam.",
-    "I have to give a presentation, and I'm terrified of public speaking.",
-    "I'm worried I'll mess up my presentation.",
-    "I have so much homework, I don't know where to start.",
-    "I'm overwhelmed with all the assignments.",
-    "I keep procrastinating on my studies, and now I'm behind.",
-    "I can't seem to get motivated to do my work.",
-    "I'm struggling to understand the material in this class.",
-    "I'm confused about the concepts.",
-    "Other"
-]
-
-conflict_tips = {
-    "I'm really anxious about an upcoming test.": [
-        "Start to study well in advance, breaking down the material into smaller, manageable chunks.",
-        "Take practice tests or quizzes to familiarize yourself with the format and identify areas where you need more focus.",
-        "Make sure your notes are clear, concise, and organized. This will make studying more efficient and less stressful.",
-        "If you're struggling with the material or have questions, don't hesitate to reach out to your teacher for clarification or extra help.",
-        "Practice relaxation techniques like deep breathing or meditation to help manage anxiety leading up to the test."
-    ],
-    "I'm afraid I'm going to fail my exam": [
-        "Remind yourself of what you do know and the areas where you excel. This can boost your confidence.",
-        "Imagine yourself taking the exam calmly and confidently, and picture yourself succeeding.",
-        "Challenge negative thoughts and replace them with positive affirmations. Believe in your ability to pass.",
-        "Talk to friends, family, or a counselor about your fears. Sometimes just expressing your worries can help alleviate them.",
-        "Focus on the process of preparing and doing your best, rather than fixating on the possibility of failure."
-    ],
-    "I have to give a presentation, and I'm terrified of public speaking.": [
-        "Knowing your material inside and out will boost your confidence and reduce anxiety.",
-        "Rehearse your presentation multiple times, ideally in front of a mirror or a small audience.",
-        "Remember that the goal is to share your knowledge and ideas, not to be a perfect performer.",
-        "If possible, start with presentations in smaller, less intimidating settings to build your confidence gradually.",
-        "Before the presentation, visualize yourself succeeding and practice deep breathing to calm your nerves."
-    ],
-    "I'm worried I'll mess up my presentation.": [
-        "If you're worried about technology glitches or forgetting your place, have a backup plan in place (e.g., printed notes, a USB drive).",
-        "It's okay to make minor mistakes. Most people won't even notice, and it doesn't mean you've failed.",
-        "Connect with your audience by making eye contact and speaking with passion. This can help you feel more comfortable.",
-        "Visual aids can help keep you on track and make your presentation more engaging.",
-        " Anticipate potential questions and practice your responses. This will help you feel more prepared and confident."
-    ],
-    "I have so much homework, I don't know where to start.": [
-        "Make a list of all your assignments and prioritize them based on deadlines and importance.",
-        "Break down large assignments into smaller, more manageable tasks. This can make the workload seem less daunting.",
-        "Plan out your study time, allocating specific blocks for each assignment. Stick to your schedule as much as possible.",
-        "Find a quiet study space and eliminate distractions like your phone or social media.",
-        "If you're struggling to manage your workload, don't hesitate to ask for help from teachers, classmates, or a tutor."
-    ],
-    "I'm overwhelmed with all the assignments.": [
-        "A visual representation of your schedule can help you see deadlines and manage your time effectively.",
-        "Allocate a specific amount of time to each task, even if you don't finish it. This prevents getting bogged down in one assignment.",
-        "Tackle the most challenging or unpleasant task first. Getting it out of the way can create momentum.",
-        "Instead of long study sessions, try shorter, focused bursts with breaks in between. This can improve concentration.",
-        "Focus on completing assignments to the best of your ability within the given time frame, rather than striving for perfection."
-    ],
-    "I keep procrastinating on my studies, and now I'm behind.": [
-        "Try to understand why you're procrastinating. Are you feeling overwhelmed, bored, or anxious?",
-        "Start with small, achievable goals to build momentum and avoid feeling discouraged.",
-        "Set up a system of rewards for completing tasks. This can help you stay motivated.",
-        "Ask a friend or family member to help you stay on track and hold you accountable.",
-        "Break down large tasks into smaller, more manageable steps. This can make it easier to get started."
-    ],
-    "I can't seem to get motivated to do my work.": [
-        "Lay out your study materials the night before to reduce the number of decisions you need to make in the morning.",
-        "Commit to working on a task for just 5 minutes. Often, this is enough to overcome inertia and get started.",
-        "If you're struggling to focus at home, try studying in a library or coffee shop.",
-        "Explore apps and tools designed to help with focus and time management, like Forest or Freedom.",
-        "Remind yourself of your long-term goals and how completing your studies will help you achieve them."
-    ],
-    "I'm struggling to understand the material in this class.": [
-        "Go back and review the material you're struggling with. Try different learning methods, like reading, watching videos, or creating diagrams.",
-        "Don't be afraid to ask your teacher or classmates for clarification on concepts you don't understand.",
-        "Look for additional resources like textbooks, online tutorials, or study guides to help you grasp the material.",
-        "Studying with classmates can help you learn from each other and gain new perspectives on the material.",
-        "The more you practice applying the concepts, the better you'll understand them."
-    ],
-    "I'm confused about the concepts.": [
-        "Explaining the material to someone else, even if it's just a stuffed animal, can help solidify your understanding.",
-        "Try to relate new concepts to things you already know. This can make them easier to grasp.",
-        "Instead of just rereading notes, test yourself regularly to see what you remember.",
-        "Don't be afraid to ask 'dumb' questions. There's no such thing! Asking questions is crucial for learning.",
-        "If your teacher's explanation isn't clicking, look for alternative explanations online or in other textbooks."
-    ]
-}
-
-selected_scenario = st.selectbox("Select a conflict scenario:", conflict_scenarios, key="selectbox2")
-
-user_input = "" 
-
-if selected_scenario == "Other":
-    user_input = st.text_area("Describe your conflict:")
-else:
-    user_input = selected_scenario
+@section("conflict")
+def conflict_section():
+    conflict_scenarios = list(content.conflict_scenarios) + ["Other"]
+    conflict_tips = content.conflict_tips
 
-matched_scenario = None 
+    selected_scenario = st.selectbox("Select a conflict scenario:", conflict_scenarios, key="selectbox2")
 
-if selected_scenario == "Other" and user_input:
+    user_input = "" 
+
+    if selected_scenario == "Other":
+        user_input = st.text_area("Describe your conflict:")
+    else:
+        user_input = selected_scenario
 
-    vectorizer = TfidfVectorizer()
-    scenario_vectors = vectorizer.fit_transform(list(conflict_tips.keys()) + [user_input])
+    matched_scenario = None 
 
-   
-    similarity_scores = cosine_similarity(scenario_vectors[-1], scenario_vectors[:-1])[0]
+    if selected_scenario == "Other" and user_input:
 
-   
-    closest_scenario_index = similarity_scores.argmax() 
-    matched_scenario = list(conflict_tips.keys())[closest_scenario_index] 
+        index = get_scenario_index().get(conflict_tips, content.conflicts_fingerprint)
+        matches = index.query(user_input, k=1, min_score=SCENARIO_MATCH_FLOOR)
+        if matches:
+            matched_scenario = matches[0].scenario
 
-  
-    scenario_for_api = matched_scenario
+        scenario_for_api = matched_scenario
 
-if st.button("Get Advice"):
-    if selected_scenario != "Other": 
-        if selected_scenario in conflict_tips:
+    if st.button("Get Advice"):
+        if selected_scenario != "Other": 
+            if selected_scenario in conflict_tips:
+                st.write("**Advice:**")
+                for tip in conflict_tips[selected_scenario]:
+                    st.write(f"- {tip}")
+        elif matched_scenario:
             st.write("**Advice:**")
-            for tip in conflict_tips[selected_scenario]:
-                st.write(f"- {tip}")
-    elif matched_scenario:
-        for tip in conflict_tips[matched_scenario]:
-            st.write(f"- {tip}")
-    elif selected_scenario == "Other" and not user_input:
-        st.write("Please provide a description of your conflict.")
-    else:
-        st.write("No advice available for the provided scenario.")
-
-def mandela_component(color, brush_size, symmetry_lines):
-    html_string = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <script src="https://unpkg.com/konva@8/konva.min.js"></script>
-        <style>
-            #container {{
-                width: 500px !important;
-                height: 500px !important;
-            }}
-            canvas {{
-                border: 1px solid blue !important; /* Force a border on the canvas */
-            }}
-            body {{
-                margin: 0 !important; /* Reset body margin in iframe */
-                overflow: hidden !important; /* Prevent scrollbars in iframe */
-            }}
-        </style>
-    </head>
-    <body>
-        <div id="container"></div>
-        <button id="clearButton">Clear</button>
-        <script>
-            const stage = new Konva.Stage({{
-                container: 'container',
-                width: 500,
-                height: 500,
-            }});
-            const layer = new Konva.Layer();
-            stage.add(layer);
-
-            const background = new Konva.Rect({{
-                x: 0,
-                y: 0,
-                width: stage.width(),
-                height: stage.height(),
-                fill: 'white',
-                listening: false,
-            }});
-            layer.add(background);
-
-            let isDrawing = false;
-            let strokeColor = '{color}';
-            let strokeWidth = '{brush_size}';
-            let symmetryLines = parseInt('{symmetry_lines}', 10);
-            let lastDrawTime = 0;
-            let currentLine;
-
-            stage.on('mousedown touchstart', (e) => {{
-                isDrawing = true;
-                const pos = stage.getPointerPosition();
-                const newLine = new Konva.Line({{
-                    points: [pos.x, pos.y],
-                    stroke: strokeColor,
-                    strokeWidth: strokeWidth,
-                    lineCap: 'round',
-                    lineJoin: 'round',
-                    name: 'userLine'
-                }});
-                layer.add(newLine);
-                currentLine = newLine;
-            }});
-
-            stage.on('mousemove touchmove', (e) => {{
-                if (!isDrawing) return;
-                const currentTime = Date.now();
-                if (currentTime - lastDrawTime < 16) return;
-                lastDrawTime = currentTime;
-
-                const pos = stage.getPointerPosition();
-                const newPoints = currentLine.points().concat([pos.x, pos.y]);
-                currentLine.points(newPoints);
-
-                const centerX = stage.width() / 2;
-                const centerY = stage.height() / 2;
-                const angle = (2 * Math.PI) / symmetryLines;
-
-                layer.getChildren((node) => node.name() === 'symmetryLine' && node.userLineRef === currentLine).forEach((node) => node.destroy());
-
-                for (let i = 1; i < symmetryLines; i++) {{
-                    const rotatedPoints = [];
-                    for (let j = 0; j < newPoints.length; j += 2) {{
-                        const dx = newPoints[j] - centerX;
-                        const dy = newPoints[j + 1] - centerY;
-                        const rotatedX = dx * Math.cos(angle * i) - dy * Math.sin(angle * i) + centerX;
-                        const rotatedY = dx * Math.sin(angle * i) + dy * Math.cos(angle * i) + centerY;
-                        rotatedPoints.push(rotatedX, rotatedY);
-                    }}
-                    const symmetryLine = new Konva.Line({{
-                        points: rotatedPoints,
-                        stroke: strokeColor,
-                        strokeWidth: strokeWidth,
-                        lineCap: 'round',
-                        lineJoin: 'round',
-                        name: 'symmetryLine',
-                        userLineRef: currentLine,
-                    }});
-                    layer.add(symmetryLine);
-                }}
-                layer.batchDraw();
-            }});
-
-            stage.on('mouseup touchend', () => {{
-                isDrawing = false;
-            }});
-
-            document.getElementById('clearButton').addEventListener('click', function() {{
-                layer.getChildren((node) => node.name() === 'userLine' || node.name() === 'symmetryLine').forEach((node) => node.destroy());
-                layer.draw();
-            }});
-
-            window.addEventListener('message', function(event) {{
-                if (event.data.type === 'color_update') {{
-                    strokeColor = event.data.color;
-                    console.log("Color updated to: ", strokeColor);
-                }}
-            }});
-            console.log("Initial color: ", strokeColor);
-
-        </script>
-    </body>
-    </html>
-    """
-    components.html(html_string, width=600, height=600)
+            if LLM_ENABLED and LLM_STREAM:
+                advised = render_streamed_advice(user_input, scenario_for_api)
+            else:
+                advice = llm_advice(user_input, scenario_for_api) if LLM_ENABLED else None
+                if advice:
+                    st.write(advice)
+                advised = bool(advice)
+            if not advised:
+                for tip in conflict_tips[matched_scenario]:
+                    st.write(f"- {tip}")
+        elif selected_scenario == "Other" and not user_input:
+            st.write("Please provide a description of your conflict.")
+        else:
+            st.write("No advice available for the provided scenario.")
+
+conflict_section()
 
 st.title("Mandala Magic")
 
-color = st.color_picker("Choose Color", "#000000")
-brush_size = st.slider("Brush Size", 1, 10, 2)
-symmetry_lines = st.slider("Symmetry Lines", 2, 20, 8)
-
-mandela_component(color, brush_size, symmetry_lines)
-
-if st.session_state.get('color') != color:
-    components.html(f"""
-    <script>
-        window.dispatchEvent(new MessageEvent('message', {{data: {{type: 'color_update', color: '{color}'}}}}));
-        console.log("message dispatched to change color to: ", '{color}');
-    </script>
-    """, height=0)
-    st.session_state['color'] = color
+@section("mandala")
+def mandala_section():
+    color = st.color_picker("Choose Color", "#000000")
+    brush_size = st.slider("Brush Size", 1, 10, 2)
+    symmetry_lines = st.slider("Symmetry Lines", 2, 20, 8)
+
+    with metrics.timed("component_render"):
+        saved = mandala.mandala_canvas(color, brush_size, symmetry_lines, show_frame_time=os.getenv("SYNAPSE_MANDALA_FRAME_TIME") == "1")
+
+    # Stroke digests of this user's gallery, seeded from the history store
+    # once per session; the strokes themselves are under data/mandalas.
+    if "saved_mandalas" not in st.session_state:
+        store = get_history_store()
+        saved_digests = store.mandalas(current_user_id()) if store else []
+        mandala_render = profiling.lazy_import("mandala_render")
+        st.session_state.saved_mandalas = [digest for digest in saved_digests if mandala_render.is_saved(digest)]
+
+    # The component keeps returning its last value on every rerun, so each save
+    # is handled once, by its timestamp.
+    if saved and saved.get("saved_at") != st.session_state.get("last_mandala_save"):
+        st.session_state.last_mandala_save = saved.get("saved_at")
+        mandala_render = profiling.lazy_import("mandala_render")
+        try:
+            digest = mandala_render.save_mandala(saved.get("strokes", []))
+        except ValueError as e:
+            st.error(f"Could not save your mandala: {e}")
+        else:
+            if digest not in st.session_state.saved_mandalas:
+                st.session_state.saved_mandalas.append(digest)
+                store = get_history_store()
+                if store:
+                    store.record_mandala(current_user_id(), digest)
+            st.success("Mandala saved to your gallery! 🎨")
+
+    if st.session_state.saved_mandalas:
+        mandala_render = profiling.lazy_import("mandala_render")
+        st.subheader("My Mandala Gallery 🖼️")
+        # Thumbnails come from the render cache; full-size exports are only
+        # rendered for the mandala picked below.
+        gallery = list(reversed(st.session_state.saved_mandalas))
+        columns = st.columns(4)
+        for i, digest in enumerate(gallery):
+            with columns[i % 4]:
+                st.image(mandala_render.rendered(digest, "png", 160), caption=f"#{len(gallery) - i}")
+        picked = st.selectbox("Export a mandala:", gallery, format_func=lambda digest: f"#{len(gallery) - gallery.index(digest)}")
+        st.download_button("Download PNG", mandala_render.rendered(picked, "png", 1000), file_name=f"mandala-{picked[:8]}.png",
+                           mime="image/png")
+        st.download_button("Download SVG", mandala_render.rendered(picked, "svg", 1000), file_name=f"mandala-{picked[:8]}.svg",
+                           mime="image/svg+xml")
+
+mandala_section()
+
+full_run = False
+profiling.mark_first_render()
+profiling.report_rerun("full", run_started)
+metrics.observe("script:full", (time.perf_counter() - run_started) * 1000)
@@ -0,0 +1,21 @@
+import os
+
+import streamlit.components.v1 as components
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mandala_frontend")
+
+# A real custom component: with a stable key Streamlit keeps the same iframe
+# across reruns and only posts the new args to it, so changing the colour,
+# brush or symmetry doesn't reload Konva or wipe the drawing.
+_mandala_component = components.declare_component("mandala", path=FRONTEND_DIR)
+
+
+def mandala_canvas(color, brush_size, symmetry_lines, show_frame_time=False, key="mandala"):
+    return _mandala_component(
+        color=color,
+        brush_size=brush_size,
+        symmetry_lines=symmetry_lines,
+        show_frame_time=show_frame_time,
+        key=key,
+        default=None,
+    )
@@ -0,0 +1,147 @@
+import functools
+import hashlib
+import io
+import json
+import os
+import re
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+import metrics
+
+# Server-side rendering of saved mandalas. The canvas sends each stroke once
+# (the arm the user drew, as a flat [x0, y0, x1, y1, ...] list) together with
+# its symmetry count; every arm is recreated here with one batched rotation.
+# Renders are cached on disk under the stroke hash, so a gallery rerun only
+# reads bytes back.
+
+CANVAS_SIZE = 500
+DATA_DIR = os.getenv("SYNAPSE_DATA_DIR", "data")
+MANDALA_DIR = os.path.join(DATA_DIR, "mandalas")
+RENDER_DIR = os.path.join(".cache", "mandala_renders")
+
+COLOR_PATTERN = re.compile(r"^#[0-9a-fA-F]{6}$")
+
+
+def normalize_strokes(raw_strokes):
+    strokes = []
+    for i, stroke in enumerate(raw_strokes):
+        if not isinstance(stroke, dict):
+            raise ValueError(f"stroke {i}: expected an object")
+        color = stroke.get("color")
+        width = stroke.get("width")
+        symmetry = stroke.get("symmetry")
+        points = stroke.get("points")
+        if not isinstance(color, str) or not COLOR_PATTERN.match(color):
+            raise ValueError(f"stroke {i}: bad color {color!r}")
+        if not isinstance(width, (int, float)) or not 0 < width <= 50:
+            raise ValueError(f"stroke {i}: bad width {width!r}")
+        if not isinstance(symmetry, int) or not 1 <= symmetry <= 64:
+            raise ValueError(f"stroke {i}: bad symmetry {symmetry!r}")
+        if not isinstance(points, list) or not points or len(points) % 2:
+            raise ValueError(f"stroke {i}: points must be a non-empty flat list of x, y pairs")
+        for value in points:
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                raise ValueError(f"stroke {i}: bad point coordinate {value!r}")
+        strokes.append({"color": color.lower(), "width": float(width), "symmetry": symmetry,
+                        "points": [round(float(value), 1) for value in points]})
+    if not strokes:
+        raise ValueError("no strokes")
+    return strokes
+
+
+def stroke_hash(strokes):
+    return hashlib.sha1(json.dumps(strokes, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def symmetric_points(points, symmetry, center=CANVAS_SIZE / 2):
+    # (symmetry, n_points, 2): every arm of the stroke, arm 0 being the one
+    # that was drawn. One einsum rotates all points for all arms at once.
+    xy = np.asarray(points, dtype=np.float64).reshape(-1, 2) - center
+    angles = 2 * np.pi * np.arange(symmetry) / symmetry
+    cos = np.cos(angles)
+    sin = np.sin(angles)
+    rotations = np.stack([np.stack([cos, -sin], axis=-1), np.stack([sin, cos], axis=-1)], axis=1)
+    return np.einsum("aij,pj->api", rotations, xy) + center
+
+
+def render_svg(strokes, size=CANVAS_SIZE):
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" viewBox="0 0 {CANVAS_SIZE} {CANVAS_SIZE}">',
+        f'<rect width="{CANVAS_SIZE}" height="{CANVAS_SIZE}" fill="white"/>',
+    ]
+    for stroke in strokes:
+        for arm in symmetric_points(stroke["points"], stroke["symmetry"]):
+            coordinates = " ".join(f"{x:.1f},{y:.1f}" for x, y in arm)
+            parts.append(
+                f'<polyline points="{coordinates}" fill="none" stroke="{stroke["color"]}" '
+                f'stroke-width="{stroke["width"]:g}" stroke-linecap="round" stroke-linejoin="round"/>'
+            )
+    parts.append("</svg>")
+    return "\n".join(parts).encode("utf-8")
+
+
+def render_png(strokes, size=CANVAS_SIZE, supersample=2):
+    # Drawn at supersample x the target size and downscaled, which gives
+    # antialiased edges that ImageDraw doesn't do on its own.
+    scale = size * supersample / CANVAS_SIZE
+    image = Image.new("RGB", (size * supersample, size * supersample), "white")
+    draw = ImageDraw.Draw(image)
+    for stroke in strokes:
+        width = max(1, round(stroke["width"] * scale))
+        for arm in symmetric_points(stroke["points"], stroke["symmetry"]) * scale:
+            coordinates = [tuple(point) for point in arm]
+            if len(coordinates) == 1:
+                x, y = coordinates[0]
+                draw.ellipse([x - width / 2, y - width / 2, x + width / 2, y + width / 2], fill=stroke["color"])
+            else:
+                draw.line(coordinates, fill=stroke["color"], width=width, joint="curve")
+    if supersample > 1:
+        image = image.resize((size, size), Image.LANCZOS)
+    output = io.BytesIO()
+    image.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+
+def save_mandala(raw_strokes):
+    strokes = normalize_strokes(raw_strokes)
+    digest = stroke_hash(strokes)
+    os.makedirs(MANDALA_DIR, exist_ok=True)
+    path = os.path.join(MANDALA_DIR, f"{digest}.json")
+    if not os.path.exists(path):
+        with open(path, "w") as f:
+            json.dump(strokes, f, separators=(",", ":"))
+    return digest
+
+
+def is_saved(digest):
+    return os.path.exists(os.path.join(MANDALA_DIR, f"{digest}.json"))
+
+
+def load_strokes(digest):
+    with open(os.path.join(MANDALA_DIR, f"{digest}.json")) as f:
+        return json.load(f)
+
+
+@functools.lru_cache(maxsize=256)
+def rendered(digest, fmt="png", size=CANVAS_SIZE):
+    # Bytes for a saved mandala, rendered at most once per (hash, format,
+    # size): memory first, then the on-disk render cache.
+    path = os.path.join(RENDER_DIR, f"{digest}-{size}.{fmt}")
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        metrics.record_cache("mandala_render_file", True)
+        return data
+    except OSError:
+        metrics.record_cache("mandala_render_file", False)
+    strokes = load_strokes(digest)
+    with metrics.timed(f"mandala_render_{fmt}"):
+        data = render_svg(strokes, size) if fmt == "svg" else render_png(strokes, size)
+    os.makedirs(RENDER_DIR, exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(data)
+    os.replace(temporary_path, path)
+    return data
@@ -0,0 +1,162 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Per-section latency histograms, cache hit/miss counters and upstream error
+# counters for the app's hot spots. Off unless SYNAPSE_METRICS=1; when off,
+# timed() hands back one shared no-op context manager and the record_*
+# functions return immediately.
+#
+# Export, both optional:
+#   SYNAPSE_METRICS_PORT      serve Prometheus text format at /metrics
+#   SYNAPSE_METRICS_FILE      rewrite that file every SYNAPSE_METRICS_INTERVAL
+#                             seconds (default 15)
+
+ENABLED = os.getenv("SYNAPSE_METRICS") == "1"
+
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_lock = threading.Lock()
+_histograms = {}
+_cache_counts = {}
+_error_counts = {}
+_exporters_started = False
+_NULL = nullcontext()
+
+
+class _Timer:
+    __slots__ = ("section", "into", "started")
+
+    def __init__(self, section, into=None):
+        self.section = section
+        self.into = into
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        ms = (time.perf_counter() - self.started) * 1000
+        if self.into is None:
+            observe(self.section, ms)
+        else:
+            self.into.append((self.section, ms))
+        return False
+
+
+def timed(section, into=None):
+    # With into, a list, the (section, ms) sample is appended there instead
+    # of observed: a worker process's histograms are never exported, so it
+    # hands its samples back for the parent to observe_all.
+    return _Timer(section, into) if ENABLED else _NULL
+
+
+def observe(section, ms):
+    if not ENABLED:
+        return
+    with _lock:
+        histogram = _histograms.get(section)
+        if histogram is None:
+            histogram = _histograms[section] = [[0] * (len(BUCKETS_MS) + 1), 0.0, 0]
+        histogram[0][bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        histogram[1] += ms
+        histogram[2] += 1
+
+
+def observe_all(samples):
+    for section, ms in samples:
+        observe(section, ms)
+
+
+def record_cache(cache, hit):
+    if not ENABLED:
+        return
+    key = (cache, "hit" if hit else "miss")
+    with _lock:
+        _cache_counts[key] = _cache_counts.get(key, 0) + 1
+
+
+def record_error(upstream, kind):
+    if not ENABLED:
+        return
+    key = (upstream, kind)
+    with _lock:
+        _error_counts[key] = _error_counts.get(key, 0) + 1
+
+
+def render_prometheus():
+    with _lock:
+        histograms = {section: ([*buckets], total, count) for section, (buckets, total, count) in _histograms.items()}
+        cache_counts = dict(_cache_counts)
+        error_counts = dict(_error_counts)
+    lines = [
+        "# HELP synapse_section_duration_ms Time spent in an instrumented section.",
+        "# TYPE synapse_section_duration_ms histogram",
+    ]
+    for section, (buckets, total, count) in sorted(histograms.items()):
+        cumulative = 0
+        for bound, bucket in zip([*BUCKETS_MS, "+Inf"], buckets):
+            cumulative += bucket
+            lines.append(f'synapse_section_duration_ms_bucket{{section="{section}",le="{bound}"}} {cumulative}')
+        lines.append(f'synapse_section_duration_ms_sum{{section="{section}"}} {total:.3f}')
+        lines.append(f'synapse_section_duration_ms_count{{section="{section}"}} {count}')
+    lines += [
+        "# HELP synapse_cache_requests_total Cache lookups by outcome.",
+        "# TYPE synapse_cache_requests_total counter",
+    ]
+    for (cache, outcome), value in sorted(cache_counts.items()):
+        lines.append(f'synapse_cache_requests_total{{cache="{cache}",outcome="{outcome}"}} {value}')
+    lines += [
+        "# HELP synapse_upstream_errors_total Failed calls to upstream services.",
+        "# TYPE synapse_upstream_errors_total counter",
+    ]
+    for (upstream, kind), value in sorted(error_counts.items()):
+        lines.append(f'synapse_upstream_errors_total{{upstream="{upstream}",kind="{kind}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _dump_periodically(path, interval):
+    while True:
+        time.sleep(interval)
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w") as f:
+            f.write(render_prometheus())
+        os.replace(temporary_path, path)
+
+
+def start_exporters():
+    # Safe to call on every rerun; the exporters start once per process.
+    global _exporters_started
+    if not ENABLED:
+        return
+    with _lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+    port = os.getenv("SYNAPSE_METRICS_PORT")
+    if port:
+        server = ThreadingHTTPServer(("0.0.0.0", int(port)), _MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    path = os.getenv("SYNAPSE_METRICS_FILE")
+    if path:
+        interval = float(os.getenv("SYNAPSE_METRICS_INTERVAL", "15"))
+        threading.Thread(target=_dump_periodically, args=(path, interval), daemon=True).start()
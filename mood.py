@@ -0,0 +1,220 @@
+import re
+
+import metrics
+
+EMOTION_KEYWORDS = {
+    "joyful": ["happy", "excited", "joy", "delighted", "thrilled", "wonderful", "amazing", "fantastic"],
+    "sad": ["sad", "unhappy", "depressed", "miserable", "heartbroken", "lonely", "grief", "disappointed"],
+    "angry": ["angry", "furious", "irritated", "frustrated", "mad", "rage", "annoyed"],
+    "scared": ["scared", "afraid", "nervous", "anxious", "terrified", "worried", "fear", "panic"],
+    "contemplative": ["thinking", "reflecting", "pondering", "considering", "wondering", "introspective", "meditative"],
+    "unwell": ["unwell", "sick", "ill", "poorly", "not feeling well", "discomfort"],
+}
+
+# Keywords only match as whole words, so "ill" no longer fires inside "will"
+# or "mad" inside "made". The inflected and derived forms the old substring
+# search also caught ("joyful", "sadness", "fearful", "panicked", ...) are
+# listed here explicitly so they keep matching, together with a few other
+# common inflections ("happier", "worrying").
+KEYWORD_FORMS = {
+    "happy": ["happier", "happiest", "happily", "happiness"],
+    "excited": ["exciting", "excitement"],
+    "joy": ["joys", "joyful", "joyfully", "joyous", "enjoy", "enjoyed", "enjoying"],
+    "delighted": ["delightful"],
+    "thrilled": ["thrilling"],
+    "amazing": ["amazed"],
+    "sad": ["sadder", "saddest", "sadly", "sadness"],
+    "unhappy": ["unhappiness"],
+    "depressed": ["depressing", "depression"],
+    "lonely": ["loneliness"],
+    "grief": ["grieving"],
+    "disappointed": ["disappointing", "disappointment"],
+    "angry": ["angrier", "angrily"],
+    "irritated": ["irritating"],
+    "frustrated": ["frustrating", "frustration"],
+    "rage": ["raging", "enraged"],
+    "annoyed": ["annoying"],
+    "scared": ["scary"],
+    "nervous": ["nervously", "nervousness"],
+    "anxious": ["anxiously", "anxiety"],
+    "terrified": ["terrifying"],
+    "worried": ["worry", "worrying"],
+    "fear": ["fears", "feared", "fearing", "fearful"],
+    "panic": ["panics", "panicked", "panicking", "panicky"],
+    "sick": ["sickness", "homesick"],
+    "ill": ["illness"],
+}
+
+# A keyword hit for an emotion earlier in this list beats hits for later ones.
+# Contemplative keywords are matched and reported but never decide the mood on
+# their own; contemplative is what's left when nothing else applies.
+KEYWORD_PRIORITY = ["joyful", "sad", "angry", "scared", "unwell"]
+
+EMOTION_TIPS = {
+    "joyful": ["You seem to be feeling joyous! Your mood can radiate and affect others too, so keep that positive energy up! ⭐"],
+    "sad": ["I'm sensing sadness. Try some mandala art, or a few positive affirmations. Perhaps listen to calming nature sounds on YouTube. 🌿"],
+    "angry": ["It sounds like you're angry. Use our conflict resolution tool, or try a mindfulness exercise. Consider a short, brisk walk outside. 🚶"],
+    "scared": ["I sense fear. Practice a grounding mindfulness exercise, or explore some positive affirmations. Maybe try a guided relaxation video online. 🎥"],
+    "unwell": ["It sounds like you're not feeling well. Try to get some rest, and drink plenty of water."],
+    "contemplative": ["In a contemplative mood? Engage with a journaling prompt, or explore our mandala art section. Consider reading a thought-provoking article."],
+}
+
+
+def normalize_phrase(phrase):
+    return " ".join(phrase.lower().split())
+
+
+def _trie_pattern(node):
+    # Turns a character trie into a regex where shared prefixes are matched
+    # once, so each position in the text costs at most one walk down the trie
+    # instead of one attempt per keyword.
+    optional = "" in node
+    branches = []
+    for char in sorted(key for key in node if key != ""):
+        token = r"\s+" if char == " " else re.escape(char)
+        branches.append(token + _trie_pattern(node[char]))
+    if not branches:
+        return ""
+    if len(branches) == 1 and not optional:
+        return branches[0]
+    return "(?:" + "|".join(branches) + ")" + ("?" if optional else "")
+
+
+def compile_keyword_matcher(emotion_keywords, keyword_forms=None):
+    lookup = {}
+    trie = {}
+    for emotion, keywords in emotion_keywords.items():
+        for keyword in keywords:
+            for form in [keyword, *(keyword_forms or {}).get(keyword, [])]:
+                phrase = normalize_phrase(form)
+                lookup[phrase] = emotion
+                node = trie
+                for char in phrase:
+                    node = node.setdefault(char, {})
+                node[""] = True
+    pattern = re.compile(r"\b" + _trie_pattern(trie) + r"\b", re.IGNORECASE)
+    return pattern, lookup
+
+
+KEYWORD_PATTERN, KEYWORD_EMOTIONS = compile_keyword_matcher(EMOTION_KEYWORDS, KEYWORD_FORMS)
+
+
+def match_emotions(text):
+    # One left-to-right pass over the text. Returns
+    # {emotion: [(keyword, start, end), ...]} with offsets into the original
+    # text; the number of hits per emotion is the length of its list.
+    matches = {}
+    for match in KEYWORD_PATTERN.finditer(text):
+        keyword = normalize_phrase(match.group(0))
+        matches.setdefault(KEYWORD_EMOTIONS[keyword], []).append((keyword, match.start(), match.end()))
+    return matches
+
+
+def priority_policy(matches):
+    for emotion in KEYWORD_PRIORITY:
+        if emotion in matches:
+            return emotion
+    return None
+
+
+def count_policy(matches):
+    # Most hits wins; KEYWORD_PRIORITY breaks ties.
+    candidates = [emotion for emotion in KEYWORD_PRIORITY if emotion in matches]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda emotion: (len(matches[emotion]), -KEYWORD_PRIORITY.index(emotion)))
+
+
+def sentiment_emotion(scores):
+    compound = scores["compound"]
+    pos = scores["pos"]
+    neg = scores["neg"]
+    if compound >= 0.5:
+        return "joyful"
+    if compound <= -0.5:
+        return "sad"
+    if neg > 0.3:
+        return "angry"
+    if pos < 0.2 and neg < 0.2 and compound < -0.2:
+        return "scared"
+    if compound < -0.2 and neg > pos:
+        return "unwell"
+    return "contemplative"
+
+
+def classify(scores, matches, policy=priority_policy, model_emotion=None):
+    # A label from the optional local model takes precedence; without one the
+    # keyword policy decides and VADER thresholds cover the rest.
+    return model_emotion or policy(matches) or sentiment_emotion(scores)
+
+
+def analyze_mood(text, analyzer, policy=priority_policy, model_emotion=None, timings=None):
+    # timings: see metrics.timed(into=...).
+    with metrics.timed("vader_polarity", timings):
+        scores = analyzer.polarity_scores(text)
+    with metrics.timed("keyword_scan", timings):
+        matches = match_emotions(text)
+    emotion = classify(scores, matches, policy, model_emotion)
+    return {
+        "emotion": emotion,
+        "tips": EMOTION_TIPS[emotion],
+        "scores": scores,
+        "matches": matches,
+    }
+
+
+# Long entries are scored sentence by sentence: each sentence gets its own
+# scores and label, and the entry as a whole gets the length-weighted mean.
+# A sentence runs up to and including its terminal punctuation or a line
+# break.
+SENTENCE_PATTERN = re.compile(r"[^.!?\n]+(?:[.!?]+[\"')\]]*|\n|$)")
+
+
+def split_sentences(text):
+    # [(start, sentence), ...] with start an offset into text.
+    sentences = []
+    for match in SENTENCE_PATTERN.finditer(text):
+        sentence = match.group(0).strip()
+        if sentence:
+            sentences.append((match.start() + match.group(0).index(sentence[0]), sentence))
+    return sentences
+
+
+def analyze_sentences(sentences, analyzer, policy=priority_policy):
+    results = []
+    for start, sentence in sentences:
+        scores = analyzer.polarity_scores(sentence)
+        matches = {
+            emotion: [(keyword, start + begin, start + end) for keyword, begin, end in found]
+            for emotion, found in match_emotions(sentence).items()
+        }
+        results.append({
+            "start": start,
+            "text": sentence,
+            "emotion": classify(scores, matches, policy),
+            "scores": scores,
+            "matches": matches,
+        })
+    return results
+
+
+def aggregate_sentences(results, policy=priority_policy, model_emotion=None):
+    # Same shape as analyze_mood's result, so partial aggregates can be shown
+    # while later sentences are still being scored.
+    weights = [len(result["text"].split()) or 1 for result in results]
+    total = sum(weights)
+    scores = {
+        key: round(sum(weight * result["scores"][key] for weight, result in zip(weights, results)) / total, 4)
+        for key in ("neg", "neu", "pos", "compound")
+    }
+    matches = {}
+    for result in results:
+        for emotion, found in result["matches"].items():
+            matches.setdefault(emotion, []).extend(found)
+    emotion = classify(scores, matches, policy, model_emotion)
+    return {
+        "emotion": emotion,
+        "tips": EMOTION_TIPS[emotion],
+        "scores": scores,
+        "matches": matches,
+    }
@@ -0,0 +1,159 @@
+import builtins
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+
+# Set SYNAPSE_PROFILE_STARTUP=1 to get per-module import times and the time
+# to first render on stderr. first_render_ms runs from the start of the first
+# script run (mark_script_start) to the end of it, so it includes the imports
+# main.py makes itself, timed by an __import__ hook (eager_imports_ms), and
+# the ones lazy_import makes (imports_ms). Under streamlit run that first run
+# only happens when the first browser session connects, so the time the
+# server sat idle before that is not counted; process_age_ms, the age of the
+# process at script start (from /proc, or psutil where there is no /proc), is
+# reported for information only. The end-to-end cold start, from launching
+# Python to the first render, is bench/run_benchmarks.py's cold_start. For a
+# per-module breakdown of Streamlit's own imports, start the server with
+# python -X importtime -m streamlit run main.py. SYNAPSE_COLD_START_BUDGET_MS
+# marks the report as over budget when first_render_ms exceeds it, so a
+# readiness probe or CI job can fail on it, and SYNAPSE_PROFILE_OUTPUT also
+# writes the report to a JSON file.
+# SYNAPSE_PROFILE_RERUNS=1 reports the script time of every full rerun and
+# every fragment rerun, with a running mean and max per scope.
+PROFILE_ENV = "SYNAPSE_PROFILE_STARTUP"
+RERUN_ENV = "SYNAPSE_PROFILE_RERUNS"
+BUDGET_ENV = "SYNAPSE_COLD_START_BUDGET_MS"
+OUTPUT_ENV = "SYNAPSE_PROFILE_OUTPUT"
+
+
+
+def _process_age():
+    # Seconds since this process was created, and where that came from.
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the parenthesised command name; starttime is
+            # field 22 of the whole line.
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")), "proc"
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return max(0.0, time.time() - psutil.Process().create_time()), "psutil"
+    except Exception:
+        return 0.0, "profiling_import"
+
+
+PROFILING_IMPORTED = time.perf_counter()
+_age, PROCESS_START_SOURCE = _process_age()
+PROCESS_START = PROFILING_IMPORTED - _age
+
+script_started = None
+import_times_ms = {}
+eager_import_times_ms = {}
+first_render_ms = None
+rerun_stats = {}
+
+
+def enabled():
+    return os.getenv(PROFILE_ENV) == "1"
+
+
+_original_import = builtins.__import__
+_import_state = threading.local()
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    # Times the script's own imports of modules that aren't loaded yet;
+    # anything they import in turn is included in their time.
+    if (level or name in sys.modules or getattr(_import_state, "active", False)
+            or (globals or {}).get("__name__") != "__main__"):
+        return _original_import(name, globals, locals, fromlist, level)
+    _import_state.active = True
+    started = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        eager_import_times_ms[name] = (time.perf_counter() - started) * 1000
+        _import_state.active = False
+
+
+if enabled():
+    builtins.__import__ = _timed_import
+
+
+def mark_script_start():
+    # Called first thing by main.py; only the first run counts.
+    global script_started
+    if script_started is None:
+        script_started = time.perf_counter()
+
+
+def lazy_import(name):
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    import_times_ms[name] = elapsed_ms
+    if enabled():
+        _emit({"event": "lazy_import", "module": name, "ms": round(elapsed_ms, 2)})
+    return module
+
+
+def mark_first_render():
+    global first_render_ms
+    if first_render_ms is not None:
+        return
+    first_render_ms = (time.perf_counter() - (script_started or PROFILING_IMPORTED)) * 1000
+    if builtins.__import__ is _timed_import:
+        builtins.__import__ = _original_import
+    if enabled():
+        report = startup_report()
+        _emit(report)
+        output = os.getenv(OUTPUT_ENV)
+        if output:
+            with open(output, "w") as f:
+                json.dump(report, f, indent=2)
+
+
+def startup_report():
+    budget = os.getenv(BUDGET_ENV)
+    budget_ms = float(budget) if budget else None
+    return {
+        "event": "first_render",
+        "process_start_source": PROCESS_START_SOURCE,
+        "process_age_ms": round(((script_started or PROFILING_IMPORTED) - PROCESS_START) * 1000, 2),
+        "first_render_ms": round(first_render_ms, 2) if first_render_ms is not None else None,
+        "eager_imports_ms": {name: round(ms, 2) for name, ms in eager_import_times_ms.items()},
+        "imports_ms": {name: round(ms, 2) for name, ms in import_times_ms.items()},
+        "budget_ms": budget_ms,
+        "over_budget": budget_ms is not None and first_render_ms is not None and first_render_ms > budget_ms,
+    }
+
+
+def report_rerun(scope, started):
+    if os.getenv(RERUN_ENV) != "1":
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    count, total_ms, max_ms = rerun_stats.get(scope, (0, 0.0, 0.0))
+    count, total_ms, max_ms = count + 1, total_ms + elapsed_ms, max(max_ms, elapsed_ms)
+    rerun_stats[scope] = (count, total_ms, max_ms)
+    _emit({
+        "event": "rerun",
+        "scope": scope,
+        "ms": round(elapsed_ms, 2),
+        "mean_ms": round(total_ms / count, 2),
+        "max_ms": round(max_ms, 2),
+        "count": count,
+    })
+
+
+def _emit(record):
+    print(f"[synapse-profile] {json.dumps(record)}", file=sys.stderr, flush=True)
@@ -0,0 +1,173 @@
+import copy
+import os
+import pickle
+import threading
+from collections import Counter, namedtuple
+
+import numpy as np
+import scipy.sparse as sp
+import sklearn
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+import content_store
+import metrics
+
+ScenarioMatch = namedtuple("ScenarioMatch", ["scenario", "score"])
+
+# Bump when ScenarioIndex's pickled attributes change.
+INDEX_FORMAT = 2
+
+
+def _documents(scenario, tips):
+    return [scenario, *tips]
+
+
+class ScenarioIndex:
+    # TF-IDF over every scenario title and every individual tip. Documents are
+    # stored grouped by scenario (title first, then its tips), so a query is a
+    # single sparse matrix-vector product followed by a per-scenario max.
+    # Rows are L2-normalised by the vectorizer, so the dot product is the
+    # cosine similarity. The product only touches the columns of the query's
+    # terms (columns, a CSC copy of matrix), and only documents that share a
+    # term with the query are scattered into the per-scenario max
+    # (row_scenarios maps each document row to its scenario).
+    def __init__(self, tips, fingerprint=None):
+        self.fingerprint = fingerprint or content_store.fingerprint(dict(tips))
+        with metrics.timed("tfidf_fit"):
+            self.vectorizer = TfidfVectorizer()
+            self.vectorizer.fit([document for scenario in tips for document in _documents(scenario, tips[scenario])])
+            self.stale_documents = 0
+            self._assemble(tips, {})
+
+    def _assemble(self, tips, blocks):
+        self.tips = {scenario: tuple(tips[scenario]) for scenario in tips}
+        self.scenarios = list(self.tips)
+        self.blocks = {
+            scenario: blocks[scenario] if scenario in blocks else self.vectorizer.transform(_documents(scenario, tips[scenario]))
+            for scenario in self.scenarios
+        }
+        self.row_scenarios = np.repeat(np.arange(len(self.scenarios)),
+                                       [self.blocks[scenario].shape[0] for scenario in self.scenarios])
+        self.matrix = sp.vstack([self.blocks[scenario] for scenario in self.scenarios], format="csr")
+        self.columns = self.matrix.tocsc()
+
+    def updated(self, tips, fingerprint=None, max_stale=0.2):
+        # Rows for scenarios whose title and tips are unchanged are reused;
+        # only new or edited scenarios are transformed, against the existing
+        # vocabulary. Once more than max_stale of all documents have been added
+        # that way the vocabulary and IDF weights are refitted from scratch.
+        changed = [scenario for scenario in tips if self.tips.get(scenario) != tuple(tips[scenario])]
+        stale_documents = self.stale_documents + sum(len(tips[scenario]) + 1 for scenario in changed)
+        total_documents = sum(len(tips[scenario]) + 1 for scenario in tips)
+        if not tips or stale_documents > max_stale * total_documents:
+            return ScenarioIndex(tips, fingerprint)
+        index = copy.copy(self)
+        index.fingerprint = fingerprint or content_store.fingerprint(dict(tips))
+        index.stale_documents = stale_documents
+        with metrics.timed("tfidf_update"):
+            index._assemble(tips, {scenario: block for scenario, block in self.blocks.items() if scenario not in changed})
+        return index
+
+    def _query_vector(self, text):
+        # (term columns, weights) as vectorizer.transform([text]) would give
+        # them for the default TfidfVectorizer (raw counts, idf, L2 norm),
+        # without its per-call overhead, which dominates a single query.
+        vocabulary = self.vectorizer.vocabulary_
+        counts = Counter(vocabulary[term] for term in self.vectorizer.build_analyzer()(text) if term in vocabulary)
+        terms = np.fromiter(counts, dtype=np.intp, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=np.float64, count=len(counts)) * self.vectorizer.idf_[terms]
+        if len(terms):
+            weights /= np.sqrt(weights @ weights)
+        return terms, weights
+
+    def scores(self, text):
+        terms, weights = self._query_vector(text)
+        document_scores = self.columns[:, terms] @ weights
+        hits = np.flatnonzero(document_scores)
+        scores = np.zeros(len(self.scenarios))
+        np.maximum.at(scores, self.row_scenarios[hits], document_scores[hits])
+        return scores
+
+    def batch_scores(self, texts):
+        # (len(texts), scenarios): one transform and one sparse product for
+        # the whole batch, over the terms any of the texts use.
+        query_matrix = self.vectorizer.transform(texts)
+        terms = np.unique(query_matrix.indices)
+        hits = (query_matrix[:, terms] @ self.columns[:, terms].T).tocoo()
+        scenario_count = len(self.scenarios)
+        scores = np.zeros(len(texts) * scenario_count)
+        np.maximum.at(scores, hits.row * scenario_count + self.row_scenarios[hits.col], hits.data)
+        return scores.reshape(len(texts), scenario_count)
+
+    def _top(self, scores, k, min_score):
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [ScenarioMatch(self.scenarios[i], float(scores[i])) for i in top if scores[i] >= min_score and scores[i] > 0]
+
+    def query(self, text, k=1, min_score=0.0):
+        # Best k scenarios scoring at least min_score, best first. An empty
+        # list means nothing is close enough to give advice for.
+        with metrics.timed("scenario_query"):
+            scores = self.scores(text)
+        return self._top(scores, k, min_score)
+
+    def query_many(self, texts, k=1, min_score=0.0):
+        if not texts:
+            return []
+        with metrics.timed("scenario_query_batch"):
+            scores = self.batch_scores(texts)
+        return [self._top(row, k, min_score) for row in scores]
+
+    @classmethod
+    def load_or_build(cls, tips, cache_dir=None, fingerprint=None):
+        # With a cache_dir the fitted index is pickled under the content
+        # fingerprint, so a restart with unchanged tips skips the fit. The
+        # file name also carries INDEX_FORMAT and the scikit-learn version,
+        # so a changed class layout or an upgraded vectorizer never loads a
+        # stale pickle; a file that fails to load for any reason is rebuilt.
+        fingerprint = fingerprint or content_store.fingerprint(dict(tips))
+        if cache_dir is None:
+            return cls(tips, fingerprint)
+        path = os.path.join(cache_dir, f"scenario_index-v{INDEX_FORMAT}-sklearn{sklearn.__version__}-{fingerprint}.pkl")
+        try:
+            with open(path, "rb") as f:
+                index = pickle.load(f)
+            if not isinstance(index, cls) or index.fingerprint != fingerprint:
+                raise ValueError(f"{path} does not hold this index")
+            metrics.record_cache("scenario_index_file", True)
+            return index
+        except Exception:
+            metrics.record_cache("scenario_index_file", False)
+        index = cls(tips, fingerprint)
+        os.makedirs(cache_dir, exist_ok=True)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as f:
+            pickle.dump(index, f)
+        os.replace(temporary_path, path)
+        for name in os.listdir(cache_dir):
+            if name.startswith("scenario_index-") and name.endswith(".pkl") and name != os.path.basename(path):
+                os.remove(os.path.join(cache_dir, name))
+        return index
+
+
+class ScenarioIndexCache:
+    # Holds the index for the current content. When the content fingerprint
+    # changes the index is updated incrementally rather than rebuilt.
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self.index = None
+        self.lock = threading.Lock()
+
+    def get(self, tips, fingerprint):
+        index = self.index
+        if index is not None and index.fingerprint == fingerprint:
+            return index
+        with self.lock:
+            if self.index is None:
+                self.index = ScenarioIndex.load_or_build(tips, self.cache_dir, fingerprint)
+            elif self.index.fingerprint != fingerprint:
+                self.index = self.index.updated(tips, fingerprint)
+            return self.index
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "bench")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import stub_llm_server
+
+
+@pytest.fixture
+def llm_stub():
+    # Factory for stub LLM servers (see bench/stub_llm_server.py), shut down
+    # after the test.
+    servers = []
+
+    def start(**options):
+        options.setdefault("latency", 0)
+        options.setdefault("token_delay", 0)
+        server, url = stub_llm_server.start(**options)
+        servers.append(server)
+        return server, url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
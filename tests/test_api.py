@@ -0,0 +1,157 @@
+import http.client
+import json
+import socket
+import threading
+
+import pytest
+
+import api
+import worker_pool
+
+
+class FakeService:
+    # Stands in for AnalysisService; analyze() can block on release or raise.
+    def __init__(self, error=None):
+        self.error = error
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def analyze(self, texts):
+        self.entered.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return [{"emotion": "joyful", "text": text} for text in texts]
+
+    def advise(self, texts, k=1):
+        return [[{"scenario": "Too much homework", "score": 1.0, "tips": []}] for _ in texts]
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(service, **options):
+        server = api.BoundedHTTPServer(("127.0.0.1", 0), service, **options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server.server_port
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def post(port, path, body, connection=None):
+    connection = connection or http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    connection.request("POST", path, body if isinstance(body, bytes) else json.dumps(body))
+    response = connection.getresponse()
+    return response.status, json.loads(response.read() or b"null")
+
+
+def raw_request(port, request):
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+        sock.sendall(request)
+        return sock.recv(65536).split(b"\r\n", 1)[0]
+
+
+@pytest.fixture(scope="module")
+def service(tmp_path_factory):
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(api, "SCENARIO_INDEX_CACHE_DIR", str(tmp_path_factory.mktemp("index")))
+        yield api.AnalysisService()
+
+
+def test_mood_and_advice_routes(serve, service):
+    port = serve(service)
+    status, result = post(port, "/v1/mood", {"text": "I am so happy today"})
+    assert status == 200 and result["emotion"] == "joyful"
+    status, result = post(port, "/v1/mood/batch", {"texts": ["I am so happy today", "I feel sad"]})
+    assert status == 200 and [entry["emotion"] for entry in result["results"]] == ["joyful", "sad"]
+    status, result = post(port, "/v1/advice", {"text": "I have too much homework", "k": 2})
+    assert status == 200 and result["matches"][0]["tips"]
+    status, result = post(port, "/v1/advice/batch", {"texts": ["too much homework", "my friend ignores me"]})
+    assert status == 200 and len(result["results"]) == 2
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/v1/mood", b"not json"),
+    ("/v1/mood", b"[1, 2]"),
+    ("/v1/mood", {"text": 3}),
+    ("/v1/advice", {"text": "homework", "k": 0}),
+])
+def test_bad_requests(serve, path, body):
+    port = serve(FakeService())
+    assert post(port, path, body)[0] == 400
+
+
+@pytest.mark.parametrize("length", [b"abc", b"-1"])
+def test_bad_content_length(serve, length):
+    port = serve(FakeService())
+    status = raw_request(port, b"POST /v1/mood HTTP/1.1\r\nHost: x\r\nContent-Length: " + length + b"\r\n\r\n")
+    assert status == b"HTTP/1.1 400 Bad Request"
+
+
+def test_too_large(serve, monkeypatch):
+    monkeypatch.setattr(api, "MAX_BODY_BYTES", 100)
+    monkeypatch.setattr(api, "MAX_BATCH", 2)
+    port = serve(FakeService())
+    assert post(port, "/v1/mood", {"text": "x" * 200})[0] == 413
+    assert post(port, "/v1/mood/batch", {"texts": ["a", "b", "c"]})[0] == 413
+
+
+def test_busy_when_slots_and_backlog_are_taken(serve):
+    service = FakeService()
+    service.release.clear()
+    port = serve(service, threads=1, backlog=0)
+    blocked = threading.Thread(target=post, args=(port, "/v1/mood", {"text": "a"}))
+    blocked.start()
+    assert service.entered.wait(5)
+    status, result = post(port, "/v1/mood", {"text": "b"})
+    service.release.set()
+    blocked.join()
+    assert status == 503
+    assert post(port, "/v1/mood", {"text": "c"})[0] == 200
+
+
+def test_idle_keep_alive_connections_do_not_take_slots(serve):
+    port = serve(FakeService(), threads=1, backlog=0)
+    idle = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    assert post(port, "/v1/mood", {"text": "a"}, idle)[0] == 200
+    # idle stays open with nothing to send; others are still served.
+    for _ in range(3):
+        assert post(port, "/v1/mood", {"text": "b"})[0] == 200
+    idle.close()
+
+
+def test_keep_alive_reuses_the_connection(serve):
+    port = serve(FakeService())
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    post(port, "/v1/mood", {"text": "a"}, connection)
+    sock = connection.sock
+    assert post(port, "/v1/mood", {"text": "b"}, connection)[0] == 200
+    assert connection.sock is sock
+    connection.close()
+
+
+def test_connections_beyond_the_limit_are_turned_away(serve):
+    port = serve(FakeService(), max_connections=1)
+    held = socket.create_connection(("127.0.0.1", port), timeout=5)
+    try:
+        status = raw_request(port, b"GET /health HTTP/1.1\r\nHost: x\r\n\r\n")
+    finally:
+        held.close()
+    assert status == b"HTTP/1.1 503 Service Unavailable"
+
+
+@pytest.mark.parametrize("error, status", [
+    (worker_pool.PoolBusy("full"), 503),
+    (worker_pool.DeadlineExceeded("slow"), 504),
+    (RuntimeError("analyzer broke"), 500),
+])
+def test_analysis_errors_get_a_response(serve, error, status):
+    port = serve(FakeService(error))
+    response_status, result = post(port, "/v1/mood", {"text": "a"})
+    assert response_status == status and "error" in result
@@ -0,0 +1,43 @@
+import os
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import content_store
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+@pytest.fixture
+def app(llm_stub, tmp_path, monkeypatch):
+    # main.py against a stub LLM, with its history and caches in tmp_path.
+    def start(**options):
+        server, url = llm_stub(**options)
+        for name, value in {"SYNAPSE_LLM_URL": url, "SYNAPSE_POOL_WORKERS": "0", "SYNAPSE_HISTORY": "0",
+                            "SYNAPSE_DATA_DIR": str(tmp_path), "SYNAPSE_INDEX_CACHE_DIR": str(tmp_path)}.items():
+            monkeypatch.setenv(name, value)
+        st.cache_resource.clear()
+        at = AppTest.from_file(MAIN_SCRIPT, default_timeout=60)
+        at.run()
+        return at
+
+    yield start
+    st.cache_resource.clear()
+
+
+def ask_for_advice(at, text):
+    at.selectbox(key="selectbox2").select("Other").run()
+    at.text_area[-1].input(text)
+    next(button for button in at.button if button.label == "Get Advice").click().run()
+
+
+@pytest.mark.parametrize("event", ["{not json", "[1, 2]"])
+def test_malformed_first_event_falls_back_to_static_tips(app, event):
+    at = app(events=[event])
+    ask_for_advice(at, "I have too much homework and no idea where to begin")
+    assert not at.exception
+    assert [error.value for error in at.error if "interrupted" in error.value]
+    tips = content_store.load_content().conflict_tips
+    shown = "\n".join(element.value for element in at.markdown)
+    assert any(tip in shown for scenario_tips in tips.values() for tip in scenario_tips)
@@ -0,0 +1,27 @@
+import pytest
+
+import assets
+
+MANIFEST = {
+    "images": {
+        "banner.png": {"width": 541, "height": 200, "png": "images/banner.png",
+                       "webp_1x": "images/banner-1x.webp", "webp_2x": "images/banner-2x.webp"},
+    },
+}
+
+
+@pytest.fixture
+def built(monkeypatch):
+    monkeypatch.setattr(assets, "manifest", lambda: MANIFEST)
+    assets.image_html.cache_clear()
+    yield
+    assets.image_html.cache_clear()
+
+
+def test_images_load_eagerly_unless_asked(built):
+    assert "loading=" not in assets.image_html("banner.png")
+    assert 'loading="lazy"' in assets.image_html("banner.png", "Banner", lazy=True)
+
+
+def test_unbuilt_images_fall_back(built):
+    assert assets.image_html("girl.png") is None
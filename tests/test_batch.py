@@ -0,0 +1,51 @@
+import io
+import json
+
+import batch
+import metrics
+import worker_pool
+
+LINES = [
+    json.dumps({"id": 1, "text": "I am so happy today"}),
+    "not json",
+    json.dumps({"id": 2, "text": 42}),
+    json.dumps(["a list"]),
+    json.dumps({"id": 3, "text": "I feel sad and lonely", "mood": "low"}),
+]
+
+
+def test_bad_records_are_skipped_and_reported():
+    bad = []
+    records = batch.read_records(io.StringIO("\n".join(LINES)), "jsonl")
+    scored = list(batch.score_stream(records, workers=1, chunk_size=1, on_error=bad.append))
+    assert [record["id"] for record in scored] == [1, 3]
+    assert scored[1]["mood"] == "low" and "emotion" in scored[1]
+    assert [record.line for record in bad] == [2, None, 4]
+
+
+def test_records_without_text_are_reported():
+    bad = []
+    records = [{"id": 1}, {"id": 2, "text": None}, {"id": 3, "body": "I am sad"}, {"id": 4, "text": ""}]
+    scored = list(batch.score_stream(records, workers=1, on_error=bad.append))
+    assert [record["id"] for record in scored] == [4]
+    assert [record.record["id"] for record in bad] == [1, 2, 3]
+    assert all("missing or not text" in record.error for record in bad)
+
+
+def test_csv_keeps_fields_added_by_later_records():
+    out = io.StringIO()
+    writer = batch.RecordWriter(out, "csv")
+    writer.write({"id": 1, "emotion": "joyful"})
+    writer.write({"id": 2, "emotion": "sad", "mood": "low"})
+    assert out.getvalue().splitlines()[-1] == '2,sad,"{""mood"": ""low""}"'
+
+
+def test_worker_timings_are_observed_in_the_parent(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    monkeypatch.setattr(metrics, "_histograms", {})
+    monkeypatch.setattr(worker_pool, "_analyzer", None)
+    worker_pool._init_worker()
+    timed = worker_pool.analyze_texts(["I am so happy", "I am sad"])
+    assert [section for section, _ in timed.timings] == ["vader_polarity", "keyword_scan"] * 2
+    assert len(worker_pool._unwrap(timed)) == 2
+    assert metrics._histograms["vader_polarity"][2] == 2
@@ -0,0 +1,46 @@
+import json
+import re
+import os
+import shutil
+
+import pytest
+
+import content_store
+
+
+@pytest.fixture
+def content_dir(tmp_path):
+    for name in content_store.CONTENT_FILES:
+        shutil.copy(os.path.join(content_store.CONTENT_DIR, name), tmp_path / name)
+    return tmp_path
+
+
+def _write(directory, name, data):
+    (directory / name).write_text(json.dumps(data), encoding="utf-8")
+
+
+def test_shipped_content_loads(content_dir):
+    content = content_store.load_content(str(content_dir))
+    assert content.challenges and content.conflict_tips
+
+
+@pytest.mark.parametrize("name, data, problem", [
+    ("challenges.json", [{"id": 1, "text": "Smile", "emoji": ":)"}], "challenges.json: expected an object"),
+    ("challenges.json", {"challenges": {"id": 1}}, "challenges.json challenges: expected a list, got dict"),
+    ("conflicts.json", {"scenarios": ["Too much homework"]}, "conflicts.json scenarios[0]: expected an object, got str"),
+    ("mindfulness.json", {"exercises": [None]}, "mindfulness.json exercises[0]: expected an object, got NoneType"),
+    ("journaling.json", ["Write about your day"], "journaling.json: expected an object"),
+])
+def test_wrong_shapes_are_reported(content_dir, name, data, problem):
+    _write(content_dir, name, data)
+    with pytest.raises(content_store.ContentError, match=re.escape(problem)):
+        content_store.load_content(str(content_dir))
+
+
+def test_bad_reload_keeps_last_good_content(content_dir):
+    store = content_store.ContentStore(str(content_dir), check_interval=0)
+    good = store.get()
+    _write(content_dir, "conflicts.json", [1, 2, 3])
+    os.utime(content_dir / "conflicts.json", ns=(0, 0))
+    assert store.get() is good
+    assert isinstance(store.last_error, content_store.ContentError)
@@ -0,0 +1,38 @@
+import threading
+
+import history_store
+
+
+def test_mandalas_persist_per_user(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    store = history_store.HistoryStore(path, flush_interval=0.01)
+    store.record_mandala(1, "aaa", at=100)
+    store.record_mandala(1, "bbb", at=200)
+    store.record_mandala(1, "aaa", at=300)
+    store.record_mandala(2, "ccc", at=100)
+    store.close()
+
+    reopened = history_store.HistoryStore(path, flush_interval=0.01)
+    assert reopened.mandalas(1) == ["aaa", "bbb"]
+    assert reopened.mandalas(2) == ["ccc"]
+    assert reopened.mandalas(3) == []
+    reopened.close()
+
+
+def test_reads_from_many_threads_share_one_connection(tmp_path, monkeypatch):
+    store = history_store.HistoryStore(str(tmp_path / "history.sqlite3"), flush_interval=0.01)
+    store.record_completion(1, 7, True)
+    store.flush()
+    connects = []
+    original = store._connect
+    monkeypatch.setattr(store, "_connect", lambda: connects.append(1) or original())
+    results = []
+    # A new thread per call, like a Streamlit rerun.
+    threads = [threading.Thread(target=lambda: results.append(store.completed_challenges(1))) for _ in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [[7]] * 50
+    assert connects == []
+    store.close()
@@ -0,0 +1,203 @@
+import threading
+import time
+
+import pytest
+import requests
+
+import llm_client
+import stub_llm_server
+
+PAYLOAD = {"inputs": "I have too much homework", "parameters": {"max_new_tokens": 50}}
+
+
+def make_client(url, **options):
+    options.setdefault("backoff_base", 0.01)
+    options.setdefault("backoff_cap", 2)
+    return llm_client.LLMClient(url, **options)
+
+
+def test_retries_503_and_429_then_succeeds(llm_stub):
+    server, url = llm_stub(script=[503, 429])
+    client = make_client(url, max_retries=3)
+    assert llm_client.extract_generated_text(client.query(PAYLOAD))
+    assert server.request_count == 3
+
+
+def test_honours_retry_after(llm_stub):
+    server, url = llm_stub(script=[503], retry_after="1")
+    client = make_client(url, max_retries=1)
+    started = time.monotonic()
+    client.query(PAYLOAD)
+    assert time.monotonic() - started >= 1
+    assert server.request_count == 2
+
+
+def test_gives_up_after_max_retries(llm_stub):
+    server, url = llm_stub(script=[503] * 5)
+    client = make_client(url, max_retries=2)
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.query(PAYLOAD)
+    assert server.request_count == 3
+
+
+def test_client_errors_are_not_retried(llm_stub):
+    server, url = llm_stub(script=[400])
+    client = make_client(url, max_retries=3)
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.query(PAYLOAD)
+    assert server.request_count == 1
+
+
+def test_read_timeout(llm_stub):
+    server, url = llm_stub(latency=1)
+    client = make_client(url, read_timeout=0.2, max_retries=0)
+    started = time.monotonic()
+    with pytest.raises(requests.exceptions.Timeout):
+        client.query(PAYLOAD)
+    assert time.monotonic() - started < 1
+
+
+def test_connect_failure_is_retried_then_raised():
+    # Nothing listens on port 9 (discard) on the loopback interface.
+    client = make_client("http://127.0.0.1:9/", max_retries=1, connect_timeout=0.5)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.query(PAYLOAD)
+    assert client.breaker.failures == 1
+
+
+def test_circuit_opens_and_recovers_through_half_open(llm_stub):
+    server, url = llm_stub(script=[500, 500])
+    client = make_client(url, max_retries=0, failure_threshold=2, reset_timeout=0.3)
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.query(PAYLOAD)
+    with pytest.raises(llm_client.CircuitOpenError):
+        client.query(PAYLOAD)
+    assert server.request_count == 2
+
+    time.sleep(0.35)
+    assert llm_client.extract_generated_text(client.query(PAYLOAD))
+    assert server.request_count == 3
+    assert client.breaker.opened_at is None
+
+
+def test_failed_half_open_trial_reopens(llm_stub):
+    server, url = llm_stub(script=[500, 500, 500])
+    client = make_client(url, max_retries=0, failure_threshold=2, reset_timeout=0.3)
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.query(PAYLOAD)
+    time.sleep(0.35)
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.query(PAYLOAD)
+    with pytest.raises(llm_client.CircuitOpenError):
+        client.query(PAYLOAD)
+    assert server.request_count == 3
+
+
+def test_half_open_allows_one_trial_at_a_time():
+    breaker = llm_client.CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow()
+
+
+def test_client_errors_do_not_open_circuit(llm_stub):
+    server, url = llm_stub(script=[400, 401, 404])
+    client = make_client(url, max_retries=0, failure_threshold=2)
+    for _ in range(3):
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.query(PAYLOAD)
+    assert llm_client.extract_generated_text(client.query(PAYLOAD))
+    assert server.request_count == 4
+
+
+def test_cache_hit_on_normalized_payload(llm_stub):
+    server, url = llm_stub()
+    client = make_client(url)
+    first = client.query({"inputs": "too much  homework\n", "parameters": {"max_new_tokens": 50, "top_p": 0.9}})
+    second = client.query({"parameters": {"top_p": 0.9, "max_new_tokens": 50}, "inputs": "too much homework"})
+    assert first == second
+    assert server.request_count == 1
+
+
+def test_cache_entries_expire(llm_stub):
+    server, url = llm_stub()
+    client = make_client(url, cache_ttl=0.1)
+    client.query(PAYLOAD)
+    time.sleep(0.15)
+    client.query(PAYLOAD)
+    assert server.request_count == 2
+
+
+def test_cache_evicts_least_recently_used(llm_stub):
+    server, url = llm_stub()
+    client = make_client(url, cache_size=2)
+    payloads = [{"inputs": text} for text in ("a", "b", "c")]
+    client.query(payloads[0])
+    client.query(payloads[1])
+    client.query(payloads[0])
+    client.query(payloads[2])
+    assert server.request_count == 3
+    client.query(payloads[0])
+    assert server.request_count == 3
+    client.query(payloads[1])
+    assert server.request_count == 4
+
+
+def test_stream_yields_tokens_and_caches(llm_stub):
+    server, url = llm_stub()
+    client = make_client(url)
+    text = "".join(client.stream(PAYLOAD))
+    assert text.strip() == stub_llm_server.REPLY
+    assert "".join(client.stream(PAYLOAD)) == text
+    assert server.request_count == 1
+
+
+
+def test_cancel_closes_a_blocked_stream(llm_stub):
+    server, url = llm_stub(token_delay=5)
+    client = make_client(url)
+    cancellation = llm_client.Cancellation()
+    closed = threading.Event()
+
+    def chunks():
+        try:
+            yield from client.stream(PAYLOAD, cancellation)
+        finally:
+            closed.set()
+
+    tokens = llm_client.stream_with_deadline(chunks(), 0.3, on_cancel=cancellation.cancel)
+    with pytest.raises(llm_client.FirstTokenTimeout):
+        next(tokens)
+    # The helper thread was blocked reading the body; it gives up promptly
+    # instead of waiting out the token delay.
+    assert closed.wait(1)
+    assert cancellation.is_set()
+
+
+def test_cancelled_stream_is_not_cached(llm_stub):
+    server, url = llm_stub()
+    client = make_client(url)
+    cancellation = llm_client.Cancellation()
+    tokens = client.stream(PAYLOAD, cancellation)
+    next(tokens)
+    cancellation.cancel()
+    tokens.close()
+    "".join(client.stream(PAYLOAD))
+    assert server.request_count == 2
+
+
+def test_cancel_interrupts_retry_backoff(llm_stub):
+    server, url = llm_stub(script=[503], retry_after="5")
+    client = make_client(url, max_retries=1, backoff_cap=10)
+    cancellation = llm_client.Cancellation()
+    threading.Timer(0.2, cancellation.cancel).start()
+    started = time.monotonic()
+    with pytest.raises(llm_client.Cancelled):
+        next(client.stream(PAYLOAD, cancellation))
+    assert time.monotonic() - started < 2
+    assert server.request_count == 1
+    assert not client.breaker.trial_in_flight
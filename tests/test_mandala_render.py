@@ -0,0 +1,16 @@
+import pytest
+
+import mandala_render
+
+STROKE = {"color": "#FF0000", "width": 2, "symmetry": 8, "points": [250, 100, 260.04, 120]}
+
+
+def test_normalize_strokes():
+    [stroke] = mandala_render.normalize_strokes([STROKE])
+    assert stroke == {"color": "#ff0000", "width": 2.0, "symmetry": 8, "points": [250.0, 100.0, 260.0, 120.0]}
+
+
+@pytest.mark.parametrize("value", [None, "12", True, [1]])
+def test_bad_point_is_a_value_error(value):
+    with pytest.raises(ValueError, match="bad point coordinate"):
+        mandala_render.normalize_strokes([dict(STROKE, points=[250, value])])
@@ -0,0 +1,109 @@
+import pytest
+
+import mood
+
+
+def scores(compound=0.0, pos=0.0, neg=0.0):
+    return {"compound": compound, "pos": pos, "neg": neg, "neu": 1.0 - pos - neg}
+
+
+@pytest.mark.parametrize("text", ["I'm not feeling well", "not  feeling\twell", "I am not\nfeeling\n  well today"])
+def test_phrase_matches_across_whitespace(text):
+    [(keyword, start, end)] = mood.match_emotions(text)["unwell"]
+    assert keyword == "not feeling well"
+    assert text[start:end].split() == ["not", "feeling", "well"]
+
+
+@pytest.mark.parametrize("text", ["I will illustrate it", "She made dinner", "a thrilling sadistic"])
+def test_keywords_do_not_match_inside_words(text):
+    matches = mood.match_emotions(text)
+    assert "unwell" not in matches and "angry" not in matches
+    assert "sad" not in matches
+
+
+@pytest.mark.parametrize("word, emotion", [
+    ("joyful", "joyful"), ("happier", "joyful"), ("sadness", "sad"), ("fearful", "scared"),
+    ("panicked", "scared"), ("worrying", "scared"), ("frustrating", "angry"), ("illness", "unwell"),
+    ("HAPPY", "joyful"),
+])
+def test_inflected_forms_match(word, emotion):
+    assert list(mood.match_emotions(f"I was {word} yesterday")) == [emotion]
+
+
+def test_match_offsets():
+    text = "Happy but mad, so mad."
+    matches = mood.match_emotions(text)
+    assert matches == {"joyful": [("happy", 0, 5)], "angry": [("mad", 10, 13), ("mad", 18, 21)]}
+
+
+def test_priority_policy_prefers_earlier_emotions():
+    matches = mood.match_emotions("happy but mad, so mad")
+    assert mood.priority_policy(matches) == "joyful"
+
+
+def test_count_policy_most_hits_then_priority():
+    assert mood.count_policy(mood.match_emotions("happy but mad, so mad")) == "angry"
+    # One hit each: KEYWORD_PRIORITY decides.
+    assert mood.count_policy(mood.match_emotions("mad and scared")) == "angry"
+    assert mood.count_policy(mood.match_emotions("scared and sad")) == "sad"
+    assert mood.count_policy(mood.match_emotions("just thinking")) is None
+
+
+@pytest.mark.parametrize("values, emotion", [
+    (scores(compound=0.6, pos=0.5), "joyful"),
+    (scores(compound=-0.6, neg=0.5), "sad"),
+    (scores(compound=-0.1, neg=0.35, pos=0.1), "angry"),
+    (scores(compound=-0.3, neg=0.15, pos=0.05), "scared"),
+    (scores(compound=-0.3, neg=0.25, pos=0.21), "unwell"),
+    (scores(), "contemplative"),
+])
+def test_sentiment_fallback(values, emotion):
+    assert mood.sentiment_emotion(values) == emotion
+
+
+def test_keywords_win_over_sentiment_and_model_wins_over_both():
+    matches = mood.match_emotions("I feel sick")
+    assert mood.classify(scores(compound=0.9, pos=0.8), matches) == "unwell"
+    assert mood.classify(scores(), {}) == "contemplative"
+    assert mood.classify(scores(), matches, model_emotion="joyful") == "joyful"
+
+
+class FixedAnalyzer:
+    # polarity_scores by sentence, so aggregates can be checked exactly.
+    def __init__(self, by_sentence):
+        self.by_sentence = by_sentence
+
+    def polarity_scores(self, sentence):
+        return self.by_sentence[sentence]
+
+
+def test_split_sentences_offsets():
+    text = '  I passed!  Was it luck?\nMaybe "not."  the end'
+    sentences = mood.split_sentences(text)
+    assert [sentence for _, sentence in sentences] == ["I passed!", "Was it luck?", 'Maybe "not."', "the end"]
+    for start, sentence in sentences:
+        assert text[start:start + len(sentence)] == sentence
+
+
+def test_sentence_matches_are_offsets_into_the_full_text():
+    text = "All good here. But I am so mad. Really mad and sad."
+    analyzer = FixedAnalyzer({sentence: scores() for _, sentence in mood.split_sentences(text)})
+    results = mood.analyze_sentences(mood.split_sentences(text), analyzer)
+    merged = mood.aggregate_sentences(results)["matches"]
+    assert [text[start:end] for _, start, end in merged["angry"]] == ["mad", "mad"]
+    assert [text[start:end] for _, start, end in merged["sad"]] == ["sad"]
+    assert merged["angry"][0][1] == text.index("mad")
+
+
+def test_aggregate_is_weighted_by_sentence_length():
+    short, long = "Great.", "this was a really long and awful day"
+    analyzer = FixedAnalyzer({
+        short: scores(compound=1.0, pos=1.0),
+        long: scores(compound=-0.5, neg=0.5),
+    })
+    results = mood.analyze_sentences([(0, short), (7, long)], analyzer)
+    aggregate = mood.aggregate_sentences(results)
+    # One word against eight.
+    assert aggregate["scores"]["compound"] == round((1 * 1.0 + 8 * -0.5) / 9, 4)
+    assert aggregate["scores"]["pos"] == round(1 / 9, 4)
+    assert aggregate["emotion"] == mood.classify(aggregate["scores"], aggregate["matches"])
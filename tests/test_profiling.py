@@ -0,0 +1,17 @@
+import time
+
+import profiling
+
+
+def test_idle_time_before_the_first_session_is_not_counted(monkeypatch):
+    # The process has been up an hour before anyone opened the page.
+    monkeypatch.setattr(profiling, "PROCESS_START", time.perf_counter() - 3600)
+    monkeypatch.setattr(profiling, "script_started", None)
+    monkeypatch.setattr(profiling, "first_render_ms", None)
+    monkeypatch.setenv(profiling.BUDGET_ENV, "1000")
+    profiling.mark_script_start()
+    profiling.mark_first_render()
+    report = profiling.startup_report()
+    assert report["first_render_ms"] < 1000
+    assert not report["over_budget"]
+    assert report["process_age_ms"] >= 3600 * 1000
@@ -0,0 +1,43 @@
+import os
+
+import scenario_index
+
+TIPS = {
+    "Too much homework": ["Break the work into small steps.", "Ask your teacher for more time."],
+    "Friend ignores me": ["Ask them calmly if something is wrong.", "Give them a little space."],
+}
+
+
+def _pickles(cache_dir):
+    return [name for name in os.listdir(cache_dir) if name.endswith(".pkl")]
+
+
+def test_cache_file_is_reused(tmp_path):
+    first = scenario_index.ScenarioIndex.load_or_build(TIPS, str(tmp_path))
+    [name] = _pickles(tmp_path)
+    assert f"v{scenario_index.INDEX_FORMAT}-sklearn{scenario_index.sklearn.__version__}-" in name
+    second = scenario_index.ScenarioIndex.load_or_build(TIPS, str(tmp_path))
+    assert second.fingerprint == first.fingerprint
+    assert second.query("so much homework")[0].scenario == "Too much homework"
+
+
+def test_unreadable_cache_file_is_rebuilt(tmp_path):
+    scenario_index.ScenarioIndex.load_or_build(TIPS, str(tmp_path))
+    [name] = _pickles(tmp_path)
+    for junk in (b"", b"not a pickle", b"\x80\x04\x95\x05\x00\x00\x00\x00\x00\x00\x00K\x01."):
+        (tmp_path / name).write_bytes(junk)
+        index = scenario_index.ScenarioIndex.load_or_build(TIPS, str(tmp_path))
+        assert index.query("my friend ignores me")[0].scenario == "Friend ignores me"
+
+
+def test_sparse_scores_match_a_dense_reference():
+    index = scenario_index.ScenarioIndex(TIPS)
+    texts = ["too much homework, homework!", "friend", "nothing in common", ""]
+    queries = index.vectorizer.transform(texts)
+    documents = (index.matrix @ queries.T).toarray()
+    expected = scenario_index.np.array([
+        [documents[index.row_scenarios == i, j].max() for i in range(len(index.scenarios))] for j in range(len(texts))
+    ])
+    assert scenario_index.np.allclose(index.batch_scores(texts), expected)
+    for text, row in zip(texts, expected):
+        assert scenario_index.np.allclose(index.scores(text), row)
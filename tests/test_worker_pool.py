@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+import worker_pool
+
+
+# Task functions live at module level so the spawned workers can import them.
+def nap(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def _no_analyzer():
+    pass
+
+
+@pytest.fixture
+def pool():
+    # One worker, nothing queued beyond it: two tasks can never be in at once.
+    pool = worker_pool.WorkerPool(1, 0, initializer=_no_analyzer)
+    pool.run(nap, 0)
+    yield pool
+    pool.shutdown()
+
+
+def test_busy_once_workers_and_pending_are_taken(pool):
+    future = pool.submit(nap, 0.5)
+    with pytest.raises(worker_pool.PoolBusy):
+        pool.submit(nap, 0)
+    assert future.result() == 0.5
+
+
+def test_slot_is_released_when_a_task_finishes(pool):
+    pool.submit(nap, 0.1).result()
+    time.sleep(0.05)  # the done callback runs on the pool's thread
+    assert pool.run(nap, 0) == 0
+
+
+def test_deadline_counts_time_spent_queued():
+    pool = worker_pool.WorkerPool(1, 1, initializer=_no_analyzer)
+    try:
+        pool.run(nap, 0)
+        pool.submit(nap, 0.6)
+        started = time.monotonic()
+        # Runs for 0.1s, but only after 0.6s in the queue.
+        with pytest.raises(worker_pool.DeadlineExceeded):
+            pool.run(nap, 0.1, deadline=0.4)
+        assert time.monotonic() - started < 0.6
+    finally:
+        pool.shutdown()
+
+
+def test_imap_keeps_at_most_workers_in_flight():
+    pool = worker_pool.WorkerPool(1, 1, initializer=_no_analyzer)
+    try:
+        pool.run(nap, 0)
+        results = []
+        consumer = threading.Thread(target=lambda: results.extend(pool.imap(nap, [0.3, 0.3, 0.3])))
+        consumer.start()
+        time.sleep(0.15)
+        # The call holds one slot at a time, leaving the other for everyone else.
+        assert pool.slots._value == 1
+        other = pool.submit(nap, 0)
+        consumer.join()
+        assert results == [0.3, 0.3, 0.3]
+        assert other.result() == 0
+    finally:
+        pool.shutdown()
+
+
+def test_imap_busy_when_nothing_can_be_admitted(pool):
+    future = pool.submit(nap, 0.3)
+    with pytest.raises(worker_pool.PoolBusy):
+        list(pool.imap(nap, [0]))
+    future.result()
+
+
+def test_imap_deadline_covers_the_whole_call(pool):
+    started = time.monotonic()
+    with pytest.raises(worker_pool.DeadlineExceeded):
+        list(pool.imap(nap, [0.3, 0.3, 0.3], deadline=0.5))
+    assert time.monotonic() - started < 0.8
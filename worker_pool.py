@@ -0,0 +1,153 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+import metrics
+import mood
+
+# CPU-bound analysis off the script threads. Streamlit runs every session's
+# script on a thread of one process, so a long VADER pass in one session holds
+# the GIL against all the others; here it runs in a worker process while the
+# session thread waits on a future, which doesn't hold the GIL.
+#
+# Admission control: at most workers + max_pending tasks are accepted at a
+# time and anything beyond that is rejected straight away with PoolBusy
+# rather than queued without bound. A task that overruns its deadline raises
+# DeadlineExceeded in the caller. A worker can't be interrupted, so the slot
+# stays taken until the task really finishes, which keeps admission honest.
+#
+# Timings taken inside a worker (mood.analyze_mood's sections) would land in
+# that process's metrics and never be exported, so the worker functions below
+# return them alongside the result as Timed, and run/imap observe them here.
+
+
+class PoolBusy(RuntimeError):
+    pass
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+Timed = namedtuple("Timed", ["result", "timings"])
+
+_analyzer = None
+_END = object()
+
+
+def _init_worker():
+    global _analyzer
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    _analyzer = SentimentIntensityAnalyzer()
+
+
+def _ping():
+    return os.getpid()
+
+
+def analyze_mood(text, model_emotion=None):
+    timings = []
+    return Timed(mood.analyze_mood(text, _analyzer, model_emotion=model_emotion, timings=timings), timings)
+
+
+def analyze_texts(texts):
+    timings = []
+    return Timed([mood.analyze_mood(text, _analyzer, timings=timings) for text in texts], timings)
+
+
+def analyze_sentences(sentences):
+    return mood.analyze_sentences(sentences, _analyzer)
+
+
+def _unwrap(value):
+    if isinstance(value, Timed):
+        metrics.observe_all(value.timings)
+        return value.result
+    return value
+
+
+class WorkerPool:
+    def __init__(self, workers=None, max_pending=None, initializer=_init_worker):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = self.workers * 4 if max_pending is None else max_pending
+        # spawn rather than fork: forking the multi-threaded server process can
+        # copy a lock held by another thread into the child.
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=initializer,
+        )
+        self.slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+
+    def warm_up(self):
+        # Starts the worker processes (and their analyzers) in the background
+        # so the first real request doesn't pay for it.
+        for _ in range(self.workers):
+            self.executor.submit(_ping)
+
+    def submit(self, func, *args):
+        if not self.slots.acquire(blocking=False):
+            metrics.record_error("worker_pool", "rejected")
+            raise PoolBusy("the analysis queue is full")
+        return self._submit_admitted(func, *args)
+
+    def _submit_admitted(self, func, *args):
+        try:
+            future = self.executor.submit(func, *args)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def run(self, func, *args, deadline=None):
+        # The deadline covers time spent queued as well as running.
+        started = time.perf_counter()
+        future = self.submit(func, *args)
+        try:
+            return _unwrap(future.result(timeout=deadline))
+        except FutureTimeout:
+            future.cancel()
+            metrics.record_error("worker_pool", "deadline")
+            raise DeadlineExceeded(f"no result within {deadline:g}s") from None
+        finally:
+            metrics.observe(f"worker_pool:{func.__name__}", (time.perf_counter() - started) * 1000)
+
+    def imap(self, func, items, deadline=None):
+        # func(item) for every item, yielded in input order as each finishes.
+        # One call keeps at most `workers` items in flight so a single long
+        # entry can't take every slot; only when none of them could be
+        # admitted does it give up with PoolBusy.
+        started = time.perf_counter()
+        items = iter(items)
+        item = next(items, _END)
+        pending = deque()
+        try:
+            while item is not _END or pending:
+                while item is not _END and len(pending) < self.workers:
+                    if not self.slots.acquire(blocking=False):
+                        if pending:
+                            break
+                        metrics.record_error("worker_pool", "rejected")
+                        raise PoolBusy("the analysis queue is full")
+                    pending.append(self._submit_admitted(func, item))
+                    item = next(items, _END)
+                timeout = None if deadline is None else max(0.0, deadline - (time.perf_counter() - started))
+                future = pending.popleft()
+                try:
+                    result = future.result(timeout=timeout)
+                except FutureTimeout:
+                    future.cancel()
+                    metrics.record_error("worker_pool", "deadline")
+                    raise DeadlineExceeded(f"no result within {deadline:g}s") from None
+                yield _unwrap(result)
+        finally:
+            for future in pending:
+                future.cancel()
+            metrics.observe(f"worker_pool:{func.__name__}", (time.perf_counter() - started) * 1000)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)